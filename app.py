@@ -1,43 +1,122 @@
 import datetime
-from flask import Flask, render_template, request, jsonify, send_file, abort, redirect, url_for
-import json
-from io import BytesIO
-import matplotlib
-# Use the Agg backend
-matplotlib.use('agg')
+import importlib
+import itertools
+import os
+import uuid
+from flask import Flask, render_template, request, jsonify, send_file, abort, redirect, url_for, Response, stream_with_context, session
 import time
 
-import generate_libraries.gen_libs_master as gen_libs_master
-import generate_llm.gen_llm as gen_llm
-from visualize import visualize_data  # Import the visualize_data function
+from generate_libraries import upload_parser
+from generate_libraries.uniqueness import UniqueValueExhausted
+import jobs
+import profiling
+import result_store
+import run_store
+import serializer
 
 app = Flask(__name__)
 
-# Global variable to store the saved JSON data
-saved_json_data = None
-json_data = None
-json_type = None
-generation_method = None
-visualization_html = None
-time_metrics = None
+# Signs the session cookie holding the session id; set SECRET_KEY when running several workers so
+# that all of them accept the same cookie
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
 
+# Generated data, time metrics and saved comparison per session. RESULT_STORE=disk keeps them in
+# the flask_session directory, which all workers on one machine share.
+app.config.setdefault('RESULT_STORE', os.environ.get('RESULT_STORE', 'memory'))
+session_results = result_store.create_store(app.config['RESULT_STORE'])
 
-def generate_data(jsonType, uploadedData, attributes, method, num_records):
-    global time_metrics
+# The generated records are written to one JSON file per result; pages only show a preview
+app.config.setdefault('RESULTS_DIRECTORY', os.environ.get('RESULTS_DIRECTORY', result_store.RESULTS_DIRECTORY))
+result_files = result_store.ResultFiles(app.config['RESULTS_DIRECTORY'])
 
+# Every run is recorded with its time metrics for the benchmark dashboard (/runs); an empty
+# RUN_STORE_PATH disables the run store
+app.config.setdefault('RUN_STORE_PATH', os.environ.get('RUN_STORE_PATH', run_store.DEFAULT_PATH))
+runs = run_store.RunStore(app.config['RUN_STORE_PATH']) if app.config['RUN_STORE_PATH'] else None
+
+# Concurrent background jobs per generation method, see jobs.METHOD_CONCURRENCY
+app.config.setdefault('JOB_CONCURRENCY', jobs.METHOD_CONCURRENCY)
+job_manager = jobs.JobManager(app.config['JOB_CONCURRENCY'])
+
+# Seconds between two progress events of a job
+JOB_EVENT_INTERVAL = 0.5
+
+# Time every attribute and LLM phase of every request, e.g. PROFILE_GENERATION=1 flask run; a
+# single request opts in with the profile form field
+app.config.setdefault('PROFILE_GENERATION', bool(os.environ.get('PROFILE_GENERATION')))
+
+# Worker processes of the Python Libraries method, e.g. GENERATION_WORKERS=8; unset generates in
+# the request's own process
+app.config.setdefault('GENERATION_WORKERS', int(os.environ['GENERATION_WORKERS']) if os.environ.get('GENERATION_WORKERS') else None)
+
+# Generation backend per method. A backend is imported on its first request, so a worker that only
+# serves the Python Libraries method never imports torch and transformers.
+GENERATION_BACKENDS = {
+    'Python Libraries': 'generate_libraries.gen_libs_master',
+    'Large Language Model': 'generate_llm.gen_llm',
+}
+
+
+def generation_backend(method):
+    return importlib.import_module(GENERATION_BACKENDS[method])
+
+
+# Load the LLMs at startup instead of on the first request, e.g. WARMUP_MODELS=1 flask run
+if os.environ.get('WARMUP_MODELS'):
+    generation_backend('Large Language Model').model_registry.warm_up()
+
+
+# CHART_RENDERING=json sends the chart series to the results page, which draws them in the
+# browser, instead of server-rendered PNGs
+app.config.setdefault('CHART_RENDERING', os.environ.get('CHART_RENDERING', 'png'))
+
+
+def visualize_data(time_metrics, saved_json_data, cur_method, json_type, run_id=None):
+    # matplotlib is imported with the first chart instead of at startup
+    import visualize
+    return visualize.visualize_data(time_metrics, saved_json_data, cur_method, json_type, run_id=run_id, rendering=app.config['CHART_RENDERING'])
+
+
+def session_id():
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+# Returns a copy of the results of the current session: result_id, preview, num_generated,
+# json_type, generation_method, time_metrics, visualization_html and saved_json_data
+def load_results():
+    return dict(session_results.get(session_id(), {}))
+
+
+def store_results(results):
+    session_results.set(session_id(), results)
+
+
+def render_results(results):
+    return render_template('results.html', json_data=results['preview'], result_id=results['result_id'], num_generated=results['num_generated'], preview_records=result_store.PREVIEW_RECORDS, json_type=results['json_type'], visualization_html=results['visualization_html'], saved_json_data=results.get('saved_json_data'), generation_method=results['generation_method'])
+
+
+# Returns the generated data and its time metrics. A caller-provided results_times list is filled
+# with the per-record timestamps while generating, which jobs use to report progress. With profile
+# the time per attribute and per LLM phase is added to the time metrics.
+def generate_data(jsonType, uploadedData, attributes, method, num_records, results_times=None, profile=False):
     results_validity = []
-    results_times = []
+    if results_times is None:
+        results_times = []
+    phase_times = {}
+    token_stats = {}
+    generation_profile = profiling.Profile() if profile else None
     start_time = time.time()
-    results_times = []
     data = []
 
     if method == 'Python Libraries':
         print("Generating data using Python libraries")
-        data, results_times = gen_libs_master.generate_data(jsonType, attributes, uploadedData, num_records)
+        data, results_times = generation_backend(method).generate_data(jsonType, attributes, uploadedData, num_records, results_times=results_times, profile=generation_profile, workers=app.config['GENERATION_WORKERS'])
     
     if method == 'Large Language Model':
         print("Generating data using LLM")
-        data, results_times, results_validity = gen_llm.generate_data(jsonType, uploadedData, num_records)
+        data, results_times, results_validity = generation_backend(method).generate_data(jsonType, uploadedData, num_records, results_times=results_times, phase_times=phase_times, token_stats=token_stats, profile=generation_profile)
         data = [{attr: entry[attr] for attr in attributes} for entry in data]
 
     end_time = time.time()
@@ -51,9 +130,23 @@ def generate_data(jsonType, uploadedData, attributes, method, num_records):
         'generation_time': generation_time,
         'avg_time_per_record': avg_time_per_record,
         'results_times': results_times,
-        'result_validity': results_validity if results_validity else None
+        'result_validity': results_validity if results_validity else None,
+        'model_load_time': round(phase_times['model_load'], 4) if 'model_load' in phase_times else None,
+        'inference_time': round(phase_times['inference'], 4) if 'inference' in phase_times else None,
+        'tokens_generated': token_stats.get('generated'),
+        'tokens_used': token_stats.get('used'),
+        'profile': generation_profile.to_dict() if generation_profile else None
     }
-    return data
+    return data, time_metrics
+
+
+def record_run(run_id, method, json_type, attributes, num_records, time_metrics):
+    if runs is not None:
+        runs.record(run_id, method, json_type, attributes, num_records, time_metrics)
+
+
+def profile_requested():
+    return app.config['PROFILE_GENERATION'] or bool(request.form.get('profile'))
 
 
 @app.route('/')
@@ -71,15 +164,28 @@ def json_type(json_type):
     return render_template('{}.html'.format(json_type))
 
 
-def preprocess_json(json_data):
-    # Remove line breaks within string values
-    json_data = json_data.replace('\n', ' ').replace('\r', '')
-    return json_data
+def read_uploaded_data(uploaded_file):
+    # Check if a file was uploaded
+    if uploaded_file.filename == '':
+        return None
+    # Parse the JSON array or NDJSON record by record from the upload stream and train the Markov
+    # models on the way; invalid JSON or UTF-8 raises a ValueError handled by the caller
+    return upload_parser.parse_upload(uploaded_file.stream)
+
+
+def iter_generated_records(jsonType, uploadedData, attributes, method, num_records):
+    if method == 'Python Libraries':
+        yield from generation_backend(method).iter_data(jsonType, attributes, uploadedData, num_records)
+
+    if method == 'Large Language Model':
+        for entry in generation_backend(method).iter_data(jsonType, uploadedData, num_records):
+            yield {attr: entry[attr] for attr in attributes}
 
 
 @app.route('/generate', methods=['POST'])
 def generate():
-    global json_data, json_type, visualization_html, saved_json_data, generation_method, generation_time, avg_time_per_record
+    results = load_results()
+    saved_json_data = results.get('saved_json_data')
 
     # Get JSON type, attributes, and generation method from the form
     json_type = request.form['jsonType']
@@ -88,74 +194,258 @@ def generate():
     uploaded_file = request.files['file']  # Access the uploaded file
     num_records = int(request.form.get('numRecords', 1))
 
-    # Check if a file was uploaded
-    if uploaded_file.filename != '':
-        # Read the contents of the uploaded file
-        file_contents = uploaded_file.read().decode('utf-8')  # Decode bytes to string
-        # Preprocess the file contents
-        file_contents = preprocess_json(file_contents)
-        # Process the file_contents as needed
-        # For example, you can parse the contents as JSON data
-        try:
-            uploaded_data = json.loads(file_contents)
-            # Process the uploaded data as needed
-        except json.JSONDecodeError as e:
-            # Handle JSON decoding error
-            return jsonify({'error': 'Invalid JSON file'}), 400
-    else:
-        uploaded_data = None
+    try:
+        uploaded_data = read_uploaded_data(uploaded_file)
+    except ValueError as e:
+        # Handle JSON decoding error, reporting where the upload is malformed
+        return jsonify({'error': f'Invalid JSON file: {e}'}), 400
 
     # Generate JSON data based on selected attributes and method
-    data = generate_data(json_type, uploaded_data, selected_attributes, generation_method, num_records)
+    try:
+        data, time_metrics = generate_data(json_type, uploaded_data, selected_attributes, generation_method, num_records, profile=profile_requested())
+    except UniqueValueExhausted as e:
+        # More unique records were requested than the data can provide
+        return jsonify({'error': str(e)}), 400
+
+    # Write the data to its result file, the page only shows the first records
+    result_id = result_files.save(data)
+    record_run(result_id, generation_method, json_type, selected_attributes, len(data), time_metrics)
 
-    # Convert data to JSON format
-    json_data = json.dumps(data, indent=4).encode('utf-8').decode('unicode_escape')
+    visualization_html = visualize_data(time_metrics, saved_json_data, generation_method, json_type, run_id=result_id)
 
-    visualization_html = visualize_data(time_metrics, saved_json_data, generation_method, json_type)
+    results.update(result_id=result_id, preview=result_store.preview(data), num_generated=len(data), json_type=json_type, generation_method=generation_method, time_metrics=time_metrics, visualization_html=visualization_html)
+    store_results(results)
 
-    return render_template('results.html', json_data=json_data, json_type=json_type, visualization_html=visualization_html, saved_json_data=saved_json_data, generation_method=generation_method)
+    return render_results(results)
+
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    # Same form fields as /generate, plus the output format: 'ndjson' (default) or 'json'
+    stream_json_type = request.form['jsonType']
+    selected_attributes = request.form.getlist('attribute')
+    method = request.form['generationMethod']
+    num_records = int(request.form.get('numRecords', 1))
+    output_format = request.form.get('format', request.args.get('format', 'ndjson'))
+
+    if output_format not in ('ndjson', 'json'):
+        return jsonify({'error': f'Invalid format: {output_format}'}), 400
+
+    try:
+        uploaded_data = read_uploaded_data(request.files['file']) if 'file' in request.files else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid JSON file: {e}'}), 400
+
+    records = iter_generated_records(stream_json_type, uploaded_data, selected_attributes, method, num_records)
+    # The first record is generated before the response starts, so requests the data cannot
+    # satisfy get the same 400 as from /generate instead of a truncated stream
+    try:
+        first_record = next(records, None)
+    except UniqueValueExhausted as e:
+        return jsonify({'error': str(e)}), 400
+    if first_record is not None:
+        records = itertools.chain([first_record], records)
+
+    if output_format == 'ndjson':
+        body = (serializer.dumps(record) + b'\n' for record in records)
+        mimetype = 'application/x-ndjson'
+    else:
+        body = stream_json_array(records)
+        mimetype = 'application/json'
+
+    return Response(stream_with_context(body), mimetype=mimetype)
+
+
+def stream_json_array(records):
+    yield b'['
+    for idx, record in enumerate(records):
+        yield (b',\n' if idx else b'\n') + serializer.dumps(record)
+    yield b'\n]\n'
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    # Same form fields as /generate; the generation runs in the background
+    job_json_type = request.form['jsonType']
+    selected_attributes = request.form.getlist('attribute')
+    method = request.form['generationMethod']
+    num_records = int(request.form.get('numRecords', 1))
+    profile = profile_requested()
+
+    try:
+        uploaded_data = read_uploaded_data(request.files['file']) if 'file' in request.files else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid JSON file: {e}'}), 400
+
+    # The job keeps the id of its result file instead of the records
+    def run(job):
+        data, time_metrics = generate_data(job_json_type, uploaded_data, selected_attributes, method, num_records, results_times=job.results_times, profile=profile)
+        result_id = result_files.save(data)
+        record_run(result_id, method, job_json_type, selected_attributes, len(data), time_metrics)
+        return result_id, time_metrics
+
+    job = job_manager.submit(method, job_json_type, num_records, run)
+    return jsonify(job.to_dict()), 202, {'Location': url_for('job_status', job_id=job.id)}
+
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404, "Unknown job")
+    return job
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    return jsonify(get_job_or_404(job_id).to_dict())
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = get_job_or_404(job_id)
+
+    # Server-sent events with the job status until the job is done
+    def events():
+        while True:
+            yield b'data: ' + serializer.dumps(job.to_dict()) + b'\n\n'
+            if job.done:
+                break
+            time.sleep(JOB_EVENT_INTERVAL)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = get_job_or_404(job_id)
+    if job.status != 'finished':
+        return jsonify(job.to_dict()), 409
+
+    result_path = result_files.path(job.result)
+    if result_path is None:
+        abort(404, "Result has expired")
+    current_datetime = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_name = f"{job.json_type}_{current_datetime}.json"
+
+    return send_file(result_path, as_attachment=True, download_name=file_name, mimetype='application/json')
+
+
+@app.route('/chart_data', methods=['GET'])
+def chart_data():
+    # The (downsampled) chart series of the latest and the saved run of the session as JSON
+    import visualize
+    results = load_results()
+    if results.get('time_metrics') is None:
+        abort(404, "No generated data")
+
+    saved_json_data = results.get('saved_json_data')
+    charts = {
+        'results': visualize.chart_series(results['time_metrics'], results['generation_method'], results['json_type']),
+        'saved_results': visualize.chart_series(saved_json_data, saved_json_data['generation_method'], saved_json_data['json_type']) if saved_json_data else None,
+    }
+    return Response(serializer.dumps(charts), mimetype='application/json')
+
+
+def get_run_store_or_404():
+    if runs is None:
+        abort(404, "The run store is disabled")
+    return runs
+
+
+@app.route('/runs', methods=['GET'])
+def runs_dashboard():
+    # Stored runs with their throughput, latency percentiles and regression flag; the runs selected
+    # with compare are overlaid in one chart
+    store = get_run_store_or_404()
+    import visualize
+    run_list = store.list_runs(method=request.args.get('method'), json_type=request.args.get('json_type'), limit=int(request.args.get('limit', 100)))
+
+    summaries = {}
+    regressions = {}
+    for run in run_list:
+        if run['config'] not in summaries:
+            summaries[run['config']] = store.summary(run['config'])
+            regressions.update(store.regressions(run['config']))
+
+    compared = [run for run in (store.get(run_id) for run_id in request.args.getlist('compare')) if run is not None]
+    overlay = visualize.cached_runs_chart(compared) if compared else None
+
+    return render_template('runs.html', runs=run_list, summaries=summaries, regressions=regressions, compared=[run['id'] for run in compared], overlay=overlay, regression_threshold=run_store.REGRESSION_THRESHOLD)
+
+
+@app.route('/api/runs', methods=['GET'])
+def api_runs():
+    store = get_run_store_or_404()
+    run_list = store.list_runs(method=request.args.get('method'), json_type=request.args.get('json_type'), config=request.args.get('config'), limit=int(request.args.get('limit', 100)))
+    return Response(serializer.dumps(run_list), mimetype='application/json')
+
+
+@app.route('/api/runs/<config>/summary', methods=['GET'])
+def api_run_summary(config):
+    # Throughput percentiles of a configuration and the regression check of each of its runs
+    store = get_run_store_or_404()
+    summary = store.summary(config)
+    summary['regressions'] = store.regressions(config)
+    return Response(serializer.dumps(summary), mimetype='application/json')
 
 
 @app.route('/download_json', methods=['POST'])
 def download_json():
-    json_data = request.form.get('json_data')
+    result_id = request.form.get('result_id')
     json_type = request.form.get('json_type')
 
-    if json_data is None:
-        abort(400, "No JSON data provided")
+    if result_id is None:
+        abort(400, "No result id provided")
+
+    result_path = result_files.path(result_id)
+    if result_path is None:
+        abort(404, "Unknown result")
 
-    fake_file = BytesIO(json_data.encode())
     current_datetime = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     file_name = f"{json_type}_{current_datetime}.json"
 
-    return send_file(fake_file, as_attachment=True, download_name=file_name)
+    # Served straight from the result file
+    return send_file(result_path, as_attachment=True, download_name=file_name, mimetype='application/json')
 
 
 @app.route('/save_json', methods=['POST'])
 def save_json():
-    global saved_json_data, json_type, generation_method, time_metrics
-
-    saved_json_data = {
-        'json_data': request.form['json_data'],
-        'json_type': json_type,
-        'generation_method': generation_method,
+    results = load_results()
+    time_metrics = results.get('time_metrics')
+    if time_metrics is None:
+        abort(400, "No generated data to save")
+    if request.form.get('result_id') != results['result_id']:
+        abort(400, "Only the latest result of the session can be saved")
+
+    results['saved_json_data'] = {
+        'result_id': results['result_id'],
+        'json_data': results['preview'],
+        'json_type': results['json_type'],
+        'generation_method': results['generation_method'],
         'generation_time': time_metrics['generation_time'],
         'avg_time_per_record': time_metrics['avg_time_per_record'],
         'results_times': time_metrics['results_times'],
-        'result_validity': time_metrics['result_validity']
+        'result_validity': time_metrics['result_validity'],
+        'model_load_time': time_metrics.get('model_load_time'),
+        'inference_time': time_metrics.get('inference_time'),
+        'profile': time_metrics.get('profile')
     }
+    store_results(results)
     return redirect(url_for('index'))
 
 
 @app.route('/clear_comparison', methods=['POST'])
 def clear_comparison():
-    global saved_json_data, visualization_html
-    saved_json_data = None  # Clear the saved comparison data
+    results = load_results()
+    if results.get('time_metrics') is None:
+        return redirect(url_for('index'))
+    results['saved_json_data'] = None  # Clear the saved comparison data
     # Recompute the visualization HTML without the saved JSON data
-    visualization_html = visualize_data(time_metrics, saved_json_data, generation_method, json_type)
+    results['visualization_html'] = visualize_data(results['time_metrics'], None, results['generation_method'], results['json_type'], run_id=results['result_id'])
+    store_results(results)
     # Return the results template with updated data
-    return render_template('results.html', json_data=json_data, json_type=json_type, visualization_html=visualization_html, saved_json_data=saved_json_data, generation_method=generation_method)
+    return render_results(results)
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
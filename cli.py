@@ -0,0 +1,222 @@
+# Description: Command-line bulk generator. Generates records with the Python libraries (in-process,
+# or sharded over a process pool with --workers/--seed) or the LLM and writes them chunk by chunk
+# as NDJSON, a JSON array, CSV or Parquet to a file or stdout, so tens of millions of records never
+# have to fit in memory. Every chunk is encoded as a whole and written with one buffered write.
+#
+#   python cli.py persons --records 1000000 --format ndjson --output persons.ndjson --workers 8 --seed 1
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+import serializer
+
+METHODS = {
+    'libraries': 'Python Libraries',
+    'llm': 'Large Language Model',
+}
+FORMATS = ['ndjson', 'json', 'csv', 'parquet']
+
+# Records per written chunk and bytes of the output buffer
+CHUNK_SIZE = 10000
+WRITE_BUFFER_SIZE = 1 << 22
+
+
+def seed_everything(seed):
+    import numpy as np
+    from faker import Faker
+    from generate_libraries.faker_pool import faker_pool
+
+    random.seed(seed)
+    np.random.seed(seed)
+    Faker.seed(seed)
+    faker_pool.reseed(seed)
+
+
+def iter_chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Yields the generated records as lists of at most chunk_size records
+def generate_chunks(json_type, attributes, uploaded_data, num_records, method='libraries', workers=1, seed=None, chunk_size=CHUNK_SIZE):
+    if method == 'llm':
+        from generate_llm import gen_llm
+        if seed is not None:
+            import torch
+            seed_everything(seed)
+            torch.manual_seed(seed)
+        records = ({attribute: entry[attribute] for attribute in attributes} for entry in gen_llm.iter_data(json_type, uploaded_data, num_records))
+        yield from iter_chunks(records, chunk_size)
+        return
+
+    from generate_libraries import gen_libs_master
+    if workers > 1 or seed is not None:
+        # Shards generated by a process pool; a seeded run gives the same records for any number of
+        # workers
+        from generate_libraries import parallel
+        chunks = parallel.iter_shards(json_type, attributes, uploaded_data, num_records, workers=workers, seed=seed, shard_size=chunk_size)
+    else:
+        chunks = gen_libs_master.iter_chunks(json_type, attributes, uploaded_data, num_records, chunk_size)
+
+    # userName, email, ... stay unique across the chunks; their suffixes are drawn in this process
+    if seed is not None:
+        random.seed(seed)
+    yield from gen_libs_master.unique_chunks(chunks, json_type, attributes, uploaded_data, num_records)
+
+
+class NdjsonWriter:
+
+    def __init__(self, f, attributes):
+        self.f = f
+
+    def write(self, chunk):
+        self.f.write(b'\n'.join(serializer.dumps(record) for record in chunk) + b'\n')
+
+    def close(self):
+        pass
+
+
+class JsonArrayWriter:
+
+    def __init__(self, f, attributes):
+        self.f = f
+        self.first = True
+        self.f.write(b'[')
+
+    def write(self, chunk):
+        self.f.write((b'\n' if self.first else b',\n') + b',\n'.join(serializer.dumps(record) for record in chunk))
+        self.first = False
+
+    def close(self):
+        self.f.write(b'\n]\n')
+
+
+class CsvWriter:
+    # Nested values are written as JSON
+
+    def __init__(self, f, attributes):
+        self.f = f
+        self.attributes = attributes
+        self.f.write(self._encode([attributes]))
+
+    def _encode(self, rows):
+        text = io.StringIO()
+        csv.writer(text, lineterminator='\n').writerows(rows)
+        return text.getvalue().encode('utf-8')
+
+    def write(self, chunk):
+        rows = [[self._cell(record.get(attribute)) for attribute in self.attributes] for record in chunk]
+        self.f.write(self._encode(rows))
+
+    def _cell(self, value):
+        return serializer.dumps(value).decode('utf-8') if isinstance(value, (dict, list)) else value
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    # One row group per chunk; the schema is taken from the first chunk
+
+    def __init__(self, f, attributes):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.f = f
+        self.attributes = attributes
+        self.writer = None
+
+    def write(self, chunk):
+        table = self.pa.Table.from_pylist([{attribute: record.get(attribute) for attribute in self.attributes} for record in chunk])
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.f, table.schema)
+        else:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {
+    'ndjson': NdjsonWriter,
+    'json': JsonArrayWriter,
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+}
+
+
+def default_attributes(json_type):
+    # The schemas of all types are registered once gen_libs_master is imported
+    from generate_libraries import gen_libs_master
+    return list(gen_libs_master.schema.get_schema(json_type).fields)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate JSON records in bulk and write them to a file or stdout")
+    parser.add_argument('json_type', help="persons, badges, organisations or goals")
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--attributes', nargs='+', help="Attributes of the records, all declared attributes of the type by default")
+    parser.add_argument('--method', choices=sorted(METHODS), default='libraries')
+    parser.add_argument('--upload', help="Seed file (JSON array or NDJSON) to generate from with Markov models")
+    parser.add_argument('--seed', type=int, help="Makes the output reproducible")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes of the Python libraries method")
+    parser.add_argument('--format', choices=FORMATS, help="Output format, derived from the output file extension by default")
+    parser.add_argument('--output', '-o', default='-', help="Output file, - for stdout")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    output_format = args.format
+    if output_format is None:
+        extension = os.path.splitext(args.output)[1].lstrip('.').lower()
+        output_format = extension if extension in FORMATS else 'ndjson'
+
+    uploaded_data = None
+    if args.upload:
+        from generate_libraries import upload_parser
+        with open(args.upload, 'rb') as upload:
+            uploaded_data = upload_parser.parse_upload(upload)
+
+    attributes = args.attributes or (list(uploaded_data.attributes) if uploaded_data is not None else default_attributes(args.json_type))
+
+    if args.output == '-':
+        # The records get their own handle on stdout; everything the generators print (also from
+        # worker processes) goes to stderr instead
+        sys.stdout.flush()
+        f = os.fdopen(os.dup(sys.stdout.fileno()), 'wb', buffering=WRITE_BUFFER_SIZE)
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    else:
+        f = open(args.output, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+    start_time = time.perf_counter()
+    written = 0
+    writer = WRITERS[output_format](f, attributes)
+    try:
+        for chunk in generate_chunks(args.json_type, attributes, uploaded_data, args.records, args.method, args.workers, args.seed, args.chunk_size):
+            writer.write(chunk)
+            written += len(chunk)
+        writer.close()
+    finally:
+        f.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Wrote {written} {args.json_type} records as {output_format} in {elapsed:.2f} s ({written / elapsed if elapsed > 0 else 0:.0f} records/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# Description: Pooled Faker value provider. Faker values are pre-generated per locale into large
+# arrays and served by random index, so bulk generation does not pay the Faker (and multi-locale
+# proxy) overhead per cell. A pool is first built at a size proportional to the request that needs
+# it, so a small request does not wait for a full pool. A background thread, with its own Faker
+# and random generator, grows the pools to their full size and regenerates a fraction of every
+# pool periodically so the served values stay varied.
+import random
+import threading
+import zlib
+
+import numpy as np
+from faker import Faker
+
+LOCALES = ['de_AT', 'de_DE']
+
+# Number of pre-generated values per provider and locale
+POOL_SIZE = 10000
+
+# Smallest number of values per locale a pool is first built with; a request drawing more values
+# gets a pool of its own size, up to POOL_SIZE
+INITIAL_POOL_SIZE = 500
+
+# Share of every pool that is regenerated per refresh, and the seconds between refreshes
+REFRESH_FRACTION = 0.05
+REFRESH_INTERVAL = 5.0
+
+PROVIDERS = ['first_name', 'last_name', 'word', 'text', 'job', 'company', 'address', 'phone_number', 'password']
+
+
+class FakerPool:
+
+    def __init__(self, locales=LOCALES, pool_size=POOL_SIZE, refresh_fraction=REFRESH_FRACTION, refresh_interval=REFRESH_INTERVAL, initial_pool_size=INITIAL_POOL_SIZE):
+        self.locales = list(locales)
+        self.pool_size = pool_size
+        self.initial_pool_size = min(initial_pool_size, pool_size)
+        self.refresh_fraction = refresh_fraction
+        self.refresh_interval = refresh_interval
+        self.fake = Faker(self.locales)
+        # Faker and NumPy generators are not thread-safe, so the refresher has its own
+        self._refresh_fake = None
+        self._refresh_rng = None
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self.seed = None
+
+    def _generate(self, provider, locale, count, fake=None):
+        generator = getattr((fake or self.fake)[locale], provider)
+        return [generator() for _ in range(count)]
+
+    def _block_size(self, pool):
+        return len(pool) // len(self.locales)
+
+    def _initial_block_size(self, size):
+        # Seeded pools are always built at full size, so their contents do not depend on the
+        # size of the first request
+        if self.seed is not None:
+            return self.pool_size
+        per_locale = -(-size // len(self.locales)) if size else 0
+        return min(self.pool_size, max(self.initial_pool_size, per_locale))
+
+    def _build(self, provider, block_size):
+        # A seeded pool derives a seed per provider, so its contents do not depend on the
+        # order in which the providers are first used
+        if self.seed is not None:
+            self.fake.seed_instance(self.seed + zlib.crc32(provider.encode()))
+
+        # One block of block_size values per locale, so drawing a random index picks the
+        # locale uniformly like the multi-locale Faker proxy does
+        values = []
+        for locale in self.locales:
+            values.extend(self._generate(provider, locale, block_size))
+        return _to_array(values)
+
+    def pool(self, provider, size=None):
+        # size is the number of values the caller is about to draw; a pool built for it holds at
+        # least that many values per locale until the refresher grows it to pool_size
+        pool = self._pools.get(provider)
+        if pool is None:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unsupported Faker provider for pooling: {provider}")
+            with self._lock:
+                pool = self._pools.get(provider)
+                if pool is None:
+                    pool = self._build(provider, self._initial_block_size(size))
+                    self._pools[provider] = pool
+            self._start_refresher()
+        return pool
+
+    def draw(self, provider, size=None):
+        pool = self.pool(provider, size)
+        if size is None:
+            return pool[random.randrange(len(pool))]
+        return pool[np.random.randint(0, len(pool), size=size)]
+
+    def _replace(self, provider, pool, new_pool):
+        with self._lock:
+            # A reseed may have replaced the pool meanwhile
+            if self._pools.get(provider) is pool:
+                self._pools[provider] = new_pool
+
+    def _refresh_generators(self):
+        # The Faker and random generator of the refresher, created with its first run
+        if self._refresh_fake is None:
+            self._refresh_fake = Faker(self.locales)
+            self._refresh_rng = np.random.default_rng()
+        return self._refresh_fake, self._refresh_rng
+
+    def grow(self):
+        # Extend every pool built below pool_size to its full size. Like refresh, this replaces
+        # the pool by a new array, keeping one block per locale.
+        fake, _ = self._refresh_generators()
+        for provider, pool in list(self._pools.items()):
+            block_size = self._block_size(pool)
+            if block_size >= self.pool_size:
+                continue
+            values = []
+            for block, locale in enumerate(self.locales):
+                values.extend(pool[block * block_size:(block + 1) * block_size])
+                values.extend(self._generate(provider, locale, self.pool_size - block_size, fake))
+            self._replace(provider, pool, _to_array(values))
+
+    def refresh(self):
+        # Regenerate a random fraction of every built pool. The new values are written into a
+        # copy that replaces the pool, so an array returned by pool() never changes while a
+        # caller is still indexing it
+        fake, rng = self._refresh_generators()
+        for provider, pool in list(self._pools.items()):
+            block_size = self._block_size(pool)
+            count = max(1, int(block_size * self.refresh_fraction))
+            refreshed = pool.copy()
+            for block, locale in enumerate(self.locales):
+                indices = rng.integers(0, block_size, size=count) + block * block_size
+                refreshed[indices] = self._generate(provider, locale, count, fake)
+            self._replace(provider, pool, refreshed)
+
+    def _refresh_loop(self):
+        # Pools built for small requests are grown first, then refreshed every interval
+        self.grow()
+        while not self._stop.wait(self.refresh_interval):
+            self.grow()
+            self.refresh()
+
+    def _start_refresher(self):
+        if self.seed is None and self.refresh_interval and (self._refresher is None or not self._refresher.is_alive()):
+            with self._lock:
+                if self._refresher is None or not self._refresher.is_alive():
+                    self._stop.clear()
+                    self._refresher = threading.Thread(target=self._refresh_loop, name='faker-pool-refresh', daemon=True)
+                    self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reseed(self, seed):
+        # Rebuild the pools reproducibly from the given seed; the background refresh is
+        # stopped since it would make the served values depend on timing
+        with self._lock:
+            self.stop()
+            self.seed = seed
+            self._pools.clear()
+
+
+def _to_array(values):
+    # An object array, so NumPy keeps the values as Python strings
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+# Shared pool used by all generate_libraries modules
+faker_pool = FakerPool()
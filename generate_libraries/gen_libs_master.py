@@ -1,33 +1,87 @@
 # Description: This file is the master file for the generation of data for the JSON files. It calls the respective functions from the other files to generate the data for the JSON files.  
+import profiling
+
+# The generator modules are imported so that they register their schemas
+from generate_libraries import ingestion, schema
 from generate_libraries import generate_persons,generate_badges,generate_activities,generate_organisations,generate_goals
 
-def generate_data(jsonType, selected_attributes, uploadedData, num_records=1):
+# Number of records generated per chunk when streaming
+STREAM_CHUNK_SIZE = 1000
+
+# An optional profiling.Profile receives the time per attribute (or of the Markov generation for
+# uploads). With workers or a seed the records are generated in a process pool (see parallel), a
+# seeded run giving the same records for any number of workers.
+def generate_data(jsonType, selected_attributes, uploadedData, num_records=1, user_num=None, results_times=None, profile=None, workers=None, seed=None):
     
     results = []
+    # A caller-provided list receives a timestamp per record while generating
+    if results_times is None:
+        results_times = []
+    if workers is not None or seed is not None:
+        # Imported here, parallel imports this module and its workers call generate_data without
+        # workers
+        from generate_libraries import parallel
+        with profiling.phase(profile, 'parallel'):
+            return parallel.generate_data(jsonType, selected_attributes, uploadedData, num_records, workers, seed, results_times=results_times)
     print("Uploaded data: ", uploadedData)
     if uploadedData is None:
 
-        if jsonType == 'persons':
-            print("Generating persons in person main file")
-            generated_data, results_times = generate_persons.generate_json_data(selected_attributes, num_records)
-        elif jsonType == 'badges':
-            generated_data, results_times = generate_badges(selected_attributes, uploadedData, num_records)
-        elif jsonType == 'activities':
-            generated_data, results_times = generate_activities(selected_attributes, uploadedData, num_records)
-        elif jsonType == 'organisations':
-            generated_data, results_times = generate_organisations(selected_attributes, uploadedData, num_records)
-        elif jsonType == 'goals':
-            generated_data, results_times = generate_goals(selected_attributes, uploadedData, num_records)
-        else:
-            raise ValueError(f"Invalid JSON type: {jsonType}")
-        
+        json_schema = schema.get_schema(jsonType)
+        print(f"Generating {jsonType} in master file")
+        generated_data, results_times = json_schema.generate(selected_attributes, num_records, {'user_num': user_num}, results_times, profile)
+
         results = generated_data
     else:
         print("Uploaded data found")
-        results = generate_persons.generate_data_mf(uploadedData, num_records)
+        json_schema = upload_schema(jsonType)
+        with profiling.phase(profile, 'markov'):
+            results = json_schema.generate_upload(uploadedData, num_records, results_times=results_times)
 
     if results:
         return results, results_times
     else:
-        return {}
+        return [], []
+
+
+def upload_schema(jsonType):
+    # Types without a registered schema fall back to the persons generator as before
+    return schema.REGISTRY.get(jsonType, generate_persons.SCHEMA)
+
+
+# Keeps the unique attributes unique across the chunks of one request, see Schema.unique_chunks
+# and Schema.unique_upload_chunks
+def unique_chunks(chunks, jsonType, selected_attributes, uploadedData, num_records):
+    if uploadedData is None:
+        return schema.get_schema(jsonType).unique_chunks(chunks, selected_attributes, num_records)
+    return upload_schema(jsonType).unique_upload_chunks(chunks, uploadedData, num_records)
+
+
+# Generator variant of generate_data which yields the records chunk by chunk, so only one
+# chunk is held in memory at a time
+def iter_data(jsonType, selected_attributes, uploadedData, num_records=1, chunk_size=STREAM_CHUNK_SIZE):
+    # An upload with fewer distinct values than requested fails before the first chunk rather than
+    # partway through the stream
+    if uploadedData is not None:
+        for attribute in upload_schema(jsonType).upload_unique:
+            ingestion.check_unique_capacity(uploadedData, attribute, num_records)
+    chunks = iter_chunks(jsonType, selected_attributes, uploadedData, num_records, chunk_size)
+    for chunk in unique_chunks(chunks, jsonType, selected_attributes, uploadedData, num_records):
+        yield from chunk
+
+
+def iter_chunks(jsonType, selected_attributes, uploadedData, num_records, chunk_size):
+    # The request context (e.g. the user number) is drawn once and shared by all chunks, as the
+    # shards of parallel.generate_data share it
+    user_num = None
+    if uploadedData is None:
+        user_num = schema.get_schema(jsonType).new_context().get('user_num')
+    remaining = num_records
+    while remaining > 0:
+        chunk_records = min(chunk_size, remaining)
+        generated_data, _ = generate_data(jsonType, selected_attributes, uploadedData, chunk_records, user_num=user_num)
+        if not generated_data:
+            return
+        yield generated_data
+        remaining -= chunk_records
+
     
\ No newline at end of file
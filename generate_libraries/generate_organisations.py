@@ -1,93 +1,46 @@
-import datetime
-import random
-from faker import Faker
-import markovify
-import random
-
-# Initialize Faker
-fake = Faker(['de_AT', 'de_DE'])
+from generate_libraries import schema
+from generate_libraries.sampling import AliasSampler
+
+# Organisations with their abbreviation and relative frequency
+ORGANISATIONS = {
+    'Rotes Kreuz': ('RK', 8),
+    'Caritas': ('C', 5),
+    'Diakonie': ('D', 3),
+    'Volkshilfe': ('VH', 3),
+    'Arbeiter Samariter Bund': ('ASB', 2),
+    'Malteser': ('M', 1),
+    'Johanniter': ('J', 1),
+    'Pfarrcaritas': ('PC', 2),
+    'Feuerwehr': ('FF', 8),
+    'Polizei': ('P', 1),
+}
+ORGANISATION_NAMES = AliasSampler(list(ORGANISATIONS), [weight for _, weight in ORGANISATIONS.values()])
+
+# The organisation of a record is drawn once and shared by organisationName and abbreviation
+def _organisation(context):
+    if 'organisation' not in context:
+        context['organisation'] = ORGANISATION_NAMES.draw()
+    return context['organisation']
+
+
+def _abbreviation(context):
+    return ORGANISATIONS[_organisation(context)][0]
+
+
+FIELDS = {
+    'organisationName': _organisation,
+    'abbreviation': _abbreviation,
+    'orgDescription': schema.pooled('text'),
+    'orgWebsite': schema.pooled('word'),
+    'orgImage': schema.pooled('word'),
+    'orgTags': schema.pooled('word'),
+    'orgLocation': schema.pooled('word'),
+}
 
 # Function to generate structured data using Faker
 def generate_json_data(attributes, num_records):
-
-    data = []
-    org = None
-
-    for _ in range(num_records):
-        record = {}
-        for attribute in attributes:
-            if attribute == 'organisationName' or attribute == 'abbreviation': 
-                organisations = {'Rotes Kreuz': 'RK', 'Caritas': 'C', 'Diakonie': 'D', 'Volkshilfe': 'VH', 'Arbeiter Samariter Bund': 'ASB', 'Malteser': 'M', 'Johanniter': 'J', 'Pfarrcaritas': 'PC', 'Feuerwehr': 'FF', 'Polizei': 'P'}
-                org = random.choice(organisations)
-                record['organisationName'] = org.key()
-                record['abbreviation'] = org.value()
-            elif attribute == 'abbreviation':
-                continue
-            elif attribute == 'orgDescription':
-                pass
-            elif attribute == 'orgWebsite':
-                record[attribute] = fake.word()
-            elif attribute == 'orgImage':
-                record[attribute] = fake.word()
-            elif attribute == 'orgTags':
-                record[attribute] = fake.word()
-            elif attribute == 'orgLocation':
-                record[attribute] = fake.word()
-            else:
-                record[attribute] = fake.word()
-        
-        data.append(record)
-    
+    data, _ = SCHEMA.generate_rows(attributes, num_records)
     return data
 
-def train_markov_model(uploaded_data, attribute):
-    if uploaded_data is None:
-        return None
-    
-    text = ""
-    for data in uploaded_data:
-        if attribute in data:
-            text += data[attribute] + " "
-
-    if not text:
-        return None
-    
-    return markovify.Text(text)
-
-
-
-def extract_attributes(uploaded_data):
-    attributes = []
-    if uploaded_data:
-        attributes = list(uploaded_data[0].keys())
-    return attributes
-
-
-
-def generate_data_mf(uploaded_data, num_records=1):
-    if not uploaded_data:
-        return None
-
-    attributes = extract_attributes(uploaded_data)
-    results = []
-
-    while len(results) < num_records:
-        selected_record = random.choice(uploaded_data)
-
-        result = {}
-
-        for attribute in attributes:
-            model = train_markov_model([selected_record], attribute)
-            if model is not None:
-                generated_word = model.make_sentence(tries=100, test_output=False).strip()
-                if generated_word is None:
-                    generated_word = fake.word()
-            else:
-                generated_word = fake.word()
-
-            # Add the generated description to the result
-            result[attribute] = generated_word
-
-        results.append(result)
 
-    return results
+SCHEMA = schema.register(schema.Schema('organisations', FIELDS, schema.pooled('word')))
@@ -1,153 +1,174 @@
 import datetime
-import random
 import time
 from faker import Faker
-import markovify
 from random_username.generate import generate_username
 
+from generate_libraries import schema
+from generate_libraries.faker_pool import faker_pool
+from generate_libraries.sampling import AliasSampler
+
 import numpy as np
-import random
 
 # Initialize Faker
 fake = Faker(['de_AT', 'de_DE'])
 
+# Attributes whose values must not repeat within one generated dataset
+UNIQUE_ATTRIBUTES = ['userName', 'email']
+
+# Declared weights of the per-record choices, sampled from alias tables built once
+NAME_BASED_USERNAME = AliasSampler([True, False], [0.5, 0.5])
+USERNAME_NUMBER = AliasSampler([True, False], [0.7, 0.3])
+EMAIL_NUMBER = AliasSampler([True, False], [0.9, 0.1])
+DEFAULT_PASSWORD = AliasSampler([True, False], [0.1, 0.9])
+EMAIL_DOMAINS = AliasSampler(['gmail.com', 'aon.at', 'gmx.at', 'outlook.com'], [1, 1, 1, 1])
+
+# Function to generate one field per record; the context of a record holds the names that
+# firstName, lastName, userName and email share
+def _first_name(context):
+    if 'first_name' not in context:
+        context['first_name'] = faker_pool.draw('first_name')
+    return context['first_name']
+
+
+def _last_name(context):
+    if 'last_name' not in context:
+        context['last_name'] = faker_pool.draw('last_name')
+    return context['last_name']
+
+
+def _user_name(context):
+    # Randomly decide between using name-based or random username
+    if NAME_BASED_USERNAME.draw():
+        random_number = context['user_num'] if USERNAME_NUMBER.draw() else ""
+        return f"{_first_name(context).lower()}{_last_name(context).lower()}{random_number}"
+    return f"{str(generate_username()[0])}"
+
+
+def _email(context):
+    random_number = context['user_num'] if EMAIL_NUMBER.draw() else ""
+    return f"{_first_name(context).lower()}.{_last_name(context).lower()}{random_number}@{EMAIL_DOMAINS.draw()}"
+
+
+def _password(context):
+    if DEFAULT_PASSWORD.draw():
+        return "12345678"
+    return faker_pool.draw('password')
+
+
+FIELDS = {
+    'firstName': _first_name,
+    'lastName': _last_name,
+    'userName': _user_name,
+    'email': _email,
+    'password': _password,
+    'birthDate': schema.date_between(datetime.date(1950, 1, 1), datetime.date(2006, 12, 31)),
+    'badgeName': schema.pooled('word'),
+    'badgeDescription': schema.pooled('text'),
+    'badgeIssuedOn': schema.date_between(datetime.date(2000, 1, 1), datetime.date(2023, 12, 31)),
+    'address': schema.pooled('address'),
+    'phone_number': schema.pooled('phone_number'),
+    'company': schema.pooled('company'),
+    'job': schema.pooled('job'),
+}
+
+
 # Function to generate structured data using Faker
-def generate_json_data(attributes, num_records):
-
-    # List of random email domains
-    email_domains = ['gmail.com', 'aon.at', 'gmx.at', 'outlook.com']
-
-    firstname_generated = None
-    lastname_generated = None
-    user_num = fake.random_int(min=1, max=9999)
-    data = []
-    results_times = []
-
-    for _ in range(num_records):
-        record = {}
-        for attribute in attributes:
-            if attribute == 'firstName':
-                if firstname_generated is None:
-                    record[attribute] = fake.first_name()
-                else:
-                    record[attribute] = firstname_generated
-            elif attribute == 'lastName':
-                if lastname_generated is None:
-                    record[attribute] = fake.last_name()
-                else:
-                    record[attribute] = lastname_generated
-            elif attribute == 'userName':
-                # Randomly decide whether to include a number
-                
-                # Randomly decide between using name-based or random username
-                if random.choice([True, False]):
-                    include_number = np.random.choice([True, False], p=[0.7, 0.3])
-                    random_number = user_num if include_number else ""
-        
-                    first_name = record.get('firstName', fake.first_name())
-                    last_name = record.get('lastName', fake.last_name())
-                    firstname_generated = first_name
-                    lastname_generated = last_name
-                    record[attribute] = f"{first_name.lower()}{last_name.lower()}{random_number}"
-                else:
-                    record[attribute] = f"{str(generate_username()[0])}"
-            
-            elif attribute == 'email':
-                if firstname_generated is None:
-                    firstname_generated = record.get('firstName', fake.first_name())
-                    lastname_generated = record.get('lastName', fake.last_name())
-                include_number = np.random.choice([True, False], p=[0.9, 0.1])
-                random_number = user_num if include_number else ""
-                domain = random.choice(email_domains)
-
-                record[attribute] = f"{firstname_generated.lower()}.{lastname_generated.lower()}{random_number}@{domain}"
-            elif attribute == 'password':
-                include_number = np.random.choice([True, False], p=[0.1, 0.9])
-                if include_number:
-                    record[attribute] = "12345678"  
-                else:
-                    record[attribute] = fake.password()
-            elif attribute == 'birthDate':
-                start_date = datetime.date(1950, 1, 1)
-                end_date = datetime.date(2006, 12, 31)
-                random_birthDate = fake.date_between(start_date=start_date, end_date=end_date)
-                record[attribute] = str(random_birthDate)
-            elif attribute == 'badgeName':
-                record[attribute] = fake.word()
-            elif attribute == 'badgeDescription':
-                record[attribute] = fake.text()
-            elif attribute == 'badgeIssuedOn':
-                start_date = datetime.date(2000, 1, 1)
-                end_date = datetime.date(2023, 12, 31)
-                random_issueDate = fake.date_between(start_date=start_date, end_date=end_date)
-                record[attribute] = str(random_issueDate)
-            elif attribute == 'address':
-                record[attribute] = fake.address()
-            elif attribute == 'phone_number':
-                record[attribute] = fake.phone_number()
-            elif attribute == 'company':
-                record[attribute] = fake.company()
-            elif attribute == 'job':
-                record[attribute] = fake.job()
-            else:
-                record[attribute] = fake.word()
-        data.append(record)
-        results_times.append(time.time())
-    
-    return data, results_times
-
-def train_markov_model(uploaded_data, attribute):
-    if uploaded_data is None:
-        return None
-    
-    text = ""
-    for data in uploaded_data:
-        if attribute in data:
-            text += data[attribute] + " "
-
-    if not text:
-        return None
-    
-    return markovify.Text(text)
-
-
-
-def extract_attributes(uploaded_data):
-    attributes = []
-    if uploaded_data:
-        attributes = list(uploaded_data[0].keys())
-    return attributes
-
-
-
-def generate_data_mf(uploaded_data, num_records=1):
-    if not uploaded_data:
-        return None
-
-    attributes = extract_attributes(uploaded_data)
-    results = []
-    selected_badges = set()
-
-    while len(results) < num_records:
-        selected_record = random.choice(uploaded_data)
-        badge_name = selected_record['badgeName']
-
-        if badge_name not in selected_badges:
-            result = {}
-
-            for attribute in attributes:
-                model = train_markov_model([selected_record], attribute)
-                if model is not None:
-                    generated_word = model.make_sentence(tries=100, test_output=False).strip()
-                    if generated_word is None:
-                        generated_word = fake.word()
-                else:
-                    generated_word = fake.word()
-
-                # Add the generated description to the result
-                result[attribute] = generated_word
-
-            results.append(result)
-            selected_badges.add(badge_name)
-
-    return results
+def generate_json_data(attributes, num_records, user_num=None, results_times=None):
+    return SCHEMA.generate_rows(attributes, num_records, {'user_num': user_num}, results_times)
+
+# Use the columnar path for requests of at least this many records
+COLUMNAR_THRESHOLD = schema.COLUMNAR_THRESHOLD
+
+
+def _with_number(values, number, sampler):
+    # Append the user number to a share of the values, decided by one vectorized draw
+    include_number = sampler.draw(len(values)).astype(bool)
+    return np.where(include_number, values + str(number), values)
+
+
+# Column generators: every attribute is drawn as a whole column. First and last names are shared
+# by userName and email, so they are drawn once per request into the context.
+def _name_columns(num_records, context):
+    if 'first_names' not in context:
+        first_pool = faker_pool.pool('first_name', num_records)
+        last_pool = faker_pool.pool('last_name', num_records)
+        first_idx = np.random.randint(0, len(first_pool), size=num_records)
+        last_idx = np.random.randint(0, len(last_pool), size=num_records)
+        # Both the names and their lower-case forms come from the same pool snapshot
+        context['first_names'] = first_pool[first_idx]
+        context['last_names'] = last_pool[last_idx]
+        context['first_lower'] = np.char.lower(first_pool.astype(str)).astype(object)[first_idx]
+        context['last_lower'] = np.char.lower(last_pool.astype(str)).astype(object)[last_idx]
+    return context
+
+
+def _first_name_column(num_records, context):
+    return _name_columns(num_records, context)['first_names']
+
+
+def _last_name_column(num_records, context):
+    return _name_columns(num_records, context)['last_names']
+
+
+def _user_name_column(num_records, context):
+    names = _name_columns(num_records, context)
+    # Randomly decide between using name-based or random username
+    name_based = NAME_BASED_USERNAME.draw(num_records).astype(bool)
+    user_names = np.empty(num_records, dtype=object)
+    user_names[name_based] = _with_number(names['first_lower'][name_based] + names['last_lower'][name_based], context['user_num'], USERNAME_NUMBER)
+    user_names[~name_based] = generate_username(int((~name_based).sum()))
+    return user_names
+
+
+def _email_column(num_records, context):
+    names = _name_columns(num_records, context)
+    local_parts = _with_number(names['first_lower'] + '.' + names['last_lower'], context['user_num'], EMAIL_NUMBER)
+    return local_parts + '@' + EMAIL_DOMAINS.draw(num_records)
+
+
+def _password_column(num_records, context):
+    include_number = DEFAULT_PASSWORD.draw(num_records).astype(bool)
+    return np.where(include_number, "12345678", faker_pool.draw('password', num_records))
+
+
+COLUMNS = {
+    'firstName': _first_name_column,
+    'lastName': _last_name_column,
+    'userName': _user_name_column,
+    'email': _email_column,
+    'password': _password_column,
+    'birthDate': schema.date_column(datetime.date(1950, 1, 1), datetime.date(2006, 12, 31)),
+    'badgeName': schema.pooled_column('word'),
+    'badgeDescription': schema.pooled_column('text'),
+    'badgeIssuedOn': schema.date_column(datetime.date(2000, 1, 1), datetime.date(2023, 12, 31)),
+    'address': schema.pooled_column('address'),
+    'phone_number': schema.pooled_column('phone_number'),
+    'company': schema.pooled_column('company'),
+    'job': schema.pooled_column('job'),
+}
+
+
+# Columnar variant of generate_json_data: every attribute is drawn as a whole column, in batches
+# of schema.COLUMNAR_CHUNK_SIZE records that are zipped into records (or returned as is).
+def generate_columnar_data(attributes, num_records, as_records=True, user_num=None, results_times=None):
+    if as_records:
+        return SCHEMA.generate_columnar(attributes, num_records, {'user_num': user_num}, results_times)
+
+    columns = SCHEMA.generate_columns(attributes, num_records, {'user_num': user_num})
+    if results_times is None:
+        results_times = []
+    results_times.extend([time.time()] * num_records)
+    return columns, results_times
+
+
+SCHEMA = schema.register(schema.Schema(
+    'persons',
+    FIELDS,
+    schema.pooled('word'),
+    columns=COLUMNS,
+    default_column=schema.pooled_column('word'),
+    unique=UNIQUE_ATTRIBUTES,
+    upload_unique=['badgeName'],
+    # One random user number per request, appended to user names and email addresses
+    request_context=lambda: {'user_num': fake.random_int(min=1, max=9999)},
+))
@@ -0,0 +1,194 @@
+# Description: Single-pass ingestion of uploaded records. While the records stream by it keeps a
+# reservoir sample of fixed size, the union of the keys of all records and per-attribute
+# statistics (types, min/max, cardinality and value frequencies of low-cardinality attributes),
+# and it trains the Markov models in batches. Generation then works from this summary: repeating
+# categorical values are drawn from their frequency table with an alias sampler and numbers from
+# their observed range, the other attributes from the Markov models.
+import random
+from collections import Counter
+
+from generate_libraries import markov_cache, uniqueness
+from generate_libraries.sampling import AliasSampler
+
+# Records kept in the reservoir sample for the record-level sampling of Schema.generate_upload
+RESERVOIR_SIZE = 10000
+
+# Distinct values up to which the frequencies of an attribute are counted
+MAX_CATEGORIES = 1000
+
+# An attribute is categorical when it has at most this many distinct values per record, i.e. when
+# its values repeat; unique values such as descriptions are left to the Markov models
+MAX_CATEGORY_RATIO = 0.2
+
+
+class AttributeStats:
+
+    def __init__(self):
+        self.count = 0
+        self.types = Counter()
+        # [min, max] per type name, for numbers and strings
+        self.ranges = {}
+        # Value frequencies, dropped once the attribute exceeds MAX_CATEGORIES distinct values
+        self.frequencies = {}
+        self.high_cardinality = False
+
+    def add(self, value):
+        self.count += 1
+        type_name = type(value).__name__
+        self.types[type_name] += 1
+
+        if isinstance(value, (int, float, str)) and not isinstance(value, bool):
+            value_range = self.ranges.get(type_name)
+            if value_range is None:
+                self.ranges[type_name] = [value, value]
+            elif value < value_range[0]:
+                value_range[0] = value
+            elif value > value_range[1]:
+                value_range[1] = value
+
+        if not self.high_cardinality:
+            if isinstance(value, (dict, list)):
+                # Nested values are not counted
+                self.high_cardinality = True
+                self.frequencies = {}
+                return
+            self.frequencies[value] = self.frequencies.get(value, 0) + 1
+            if len(self.frequencies) > MAX_CATEGORIES:
+                self.high_cardinality = True
+                self.frequencies = {}
+
+    @property
+    def type(self):
+        return self.types.most_common(1)[0][0] if self.types else None
+
+    @property
+    def categorical(self):
+        return not self.high_cardinality and 0 < len(self.frequencies) <= self.count * MAX_CATEGORY_RATIO
+
+    @property
+    def min(self):
+        value_range = self.ranges.get(self.type)
+        return value_range[0] if value_range else None
+
+    @property
+    def max(self):
+        value_range = self.ranges.get(self.type)
+        return value_range[1] if value_range else None
+
+
+class DatasetSummary:
+    # The ingested upload. It behaves like the list of the records in its reservoir sample, so
+    # the record-level sampling of Schema.generate_upload works on it unchanged.
+
+    def __init__(self, sample, attributes, stats, num_records, digest, models):
+        self.sample = sample
+        self.attributes = attributes
+        self.stats = stats
+        self.num_records = num_records
+        self.digest = digest
+        self.models = models
+        # Alias tables of the categorical attributes, built once
+        self.samplers = {
+            attribute: AliasSampler.from_counts(attribute_stats.frequencies)
+            for attribute, attribute_stats in stats.items() if attribute_stats.categorical
+        }
+
+    def __len__(self):
+        return len(self.sample)
+
+    def __getitem__(self, index):
+        return self.sample[index]
+
+    def __iter__(self):
+        return iter(self.sample)
+
+    def __repr__(self):
+        return f"<DatasetSummary {self.num_records} records, {len(self.attributes)} attributes>"
+
+    def draw_value(self, attribute):
+        # A value drawn from the summary, None when the attribute has to be generated otherwise
+        if attribute in self.samplers:
+            return self.samplers[attribute].draw()
+
+        attribute_stats = self.stats.get(attribute)
+        if attribute_stats is None or attribute_stats.types[attribute_stats.type] != attribute_stats.count:
+            return None
+        if attribute_stats.type == 'int':
+            return random.randint(attribute_stats.min, attribute_stats.max)
+        if attribute_stats.type == 'float':
+            return random.uniform(attribute_stats.min, attribute_stats.max)
+        return None
+
+
+def extract_attributes(uploaded_data):
+    # Ingested uploads know the keys of all records, plain lists only those of the first record
+    if isinstance(uploaded_data, DatasetSummary):
+        return list(uploaded_data.attributes)
+    return list(uploaded_data[0].keys()) if uploaded_data else []
+
+
+def draw_value(uploaded_data, attribute):
+    # Plain lists of records have no summary to draw from
+    if isinstance(uploaded_data, DatasetSummary):
+        return uploaded_data.draw_value(attribute)
+    return None
+
+
+def check_unique_capacity(uploaded_data, attribute, num_records):
+    # A categorical attribute of an ingested upload cannot yield more distinct values than it has
+    if isinstance(uploaded_data, DatasetSummary) and attribute in uploaded_data.samplers:
+        available = len(uploaded_data.samplers[attribute])
+        if available < num_records:
+            raise uniqueness.UniqueValueExhausted(f"The upload has only {available} distinct {attribute} values, {num_records} unique records were requested")
+
+
+def make_value(uploaded_data, models, attribute, record_index=None):
+    # Categorical and numeric attributes of an ingested upload are drawn from its summary, the
+    # others from the Markov models, trained across the whole upload or, with a record_index, on
+    # that record only. None when neither yields a value.
+    if record_index is None:
+        value = draw_value(uploaded_data, attribute)
+        if value is not None:
+            return value
+    return models.make_value(attribute, record_index)
+
+
+def ingest(records, digest=None, sample_size=RESERVOIR_SIZE, batch_size=markov_cache.TRAIN_BATCH_SIZE, corpus_models=None):
+    # Consumes an iterable of records once; digest is an optional hashlib object the records were
+    # hashed into while being read. Given the corpus_models of an earlier upload of the same
+    # bytes, nothing is trained.
+    sample = []
+    stats = {}
+    trainer = markov_cache.CorpusTrainer() if corpus_models is None else None
+    batch = []
+    num_records = 0
+
+    for record in records:
+        num_records += 1
+        # Reservoir sampling: every record ends up in the sample with the same probability
+        if len(sample) < sample_size:
+            sample.append(record)
+        else:
+            idx = random.randrange(num_records)
+            if idx < sample_size:
+                sample[idx] = record
+
+        for key, value in record.items():
+            attribute_stats = stats.get(key)
+            if attribute_stats is None:
+                attribute_stats = stats[key] = AttributeStats()
+            attribute_stats.add(value)
+
+        if trainer is not None:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                trainer.add(batch)
+                batch = []
+    if trainer is not None:
+        trainer.add(batch)
+        corpus_models = trainer.models()
+
+    # The union of the keys of all records, in the order they first appeared
+    attributes = list(stats)
+    models = markov_cache.MarkovModels(sample, attributes, corpus_models=corpus_models)
+    return DatasetSummary(sample, attributes, stats, num_records, digest.hexdigest() if digest is not None else None, models)
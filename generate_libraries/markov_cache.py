@@ -0,0 +1,173 @@
+# Description: Trains the Markov models used by Schema.generate_upload once per uploaded dataset
+# and keeps them in an LRU cache keyed by a content hash of the upload, so repeated requests on the
+# same dataset reuse the compiled chains instead of retraining per attribute and output record.
+# Streamed uploads (see upload_parser) are trained batch by batch with a CorpusTrainer, so only the
+# chains are kept in memory rather than the whole corpus.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Number of uploaded datasets whose models are kept in memory
+MAX_CACHED_DATASETS = 8
+
+# Records per training batch of a CorpusTrainer
+TRAIN_BATCH_SIZE = 10000
+
+
+def dataset_hash(uploaded_data):
+    content = json.dumps(uploaded_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def text_model(values):
+    # One sentence per value; nested objects and lists cannot be modelled as text
+    lines = [str(value).replace('\n', ' ') for value in values if isinstance(value, (str, int, float)) and str(value).strip()]
+    if not lines:
+        return None
+    # markovify is only imported once an upload is trained on
+    import markovify
+    return markovify.NewlineText('\n'.join(lines), well_formed=False, retain_original=False)
+
+
+def train_markov_model(values):
+    model = text_model(values)
+    if model is None:
+        return None
+    return model.compile(inplace=True)
+
+
+class CorpusTrainer:
+    # Trains one model per attribute from records fed in batches. The transition counts of every
+    # batch are added to the running chain, which is the same chain markovify.combine builds,
+    # without copying it per batch. Without a list of attributes every key of the records is
+    # trained, in the order the keys first appear.
+
+    def __init__(self, attributes=None):
+        self.fixed_attributes = attributes is not None
+        self.attributes = list(attributes) if attributes is not None else []
+        self.chains = {}
+
+    def add(self, records):
+        if not records:
+            return
+        if not self.fixed_attributes:
+            known = set(self.attributes)
+            for record in records:
+                for key in record:
+                    if key not in known:
+                        known.add(key)
+                        self.attributes.append(key)
+        for attribute in self.attributes:
+            model = text_model(record.get(attribute) for record in records)
+            if model is None:
+                continue
+            chain = self.chains.setdefault(attribute, {})
+            for state, options in model.chain.model.items():
+                counts = chain.setdefault(state, {})
+                for word, count in options.items():
+                    counts[word] = counts.get(word, 0) + count
+
+    def models(self):
+        import markovify
+        models = {}
+        for attribute in self.attributes:
+            chain = self.chains.get(attribute)
+            models[attribute] = markovify.NewlineText.from_chain(chain).compile(inplace=True) if chain else None
+        return models
+
+
+def train_corpus_models(records, attributes, batch_size=TRAIN_BATCH_SIZE):
+    trainer = CorpusTrainer(attributes)
+    for start in range(0, len(records), batch_size):
+        trainer.add(records[start:start + batch_size])
+    return trainer.models()
+
+
+class MarkovModels:
+
+    def __init__(self, uploaded_data, attributes, corpus_models=None):
+        self.uploaded_data = uploaded_data
+        self.attributes = list(attributes)
+        # One model per attribute, trained across the whole uploaded corpus unless the caller
+        # trained them already while reading the upload
+        if corpus_models is None:
+            corpus_models = train_corpus_models(uploaded_data, self.attributes)
+        self.corpus_models = corpus_models
+        # Per-record models are trained lazily, at most once per record and attribute
+        self.record_models = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to the worker processes of parallel without the lock; the per-record models are
+        # retrained there as needed
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['record_models'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def model(self, attribute, record_index=None):
+        if record_index is None:
+            return self.corpus_models.get(attribute)
+
+        key = (record_index, attribute)
+        if key not in self.record_models:
+            model = train_markov_model([self.uploaded_data[record_index].get(attribute)])
+            with self._lock:
+                self.record_models[key] = model
+        return self.record_models[key]
+
+    def make_value(self, attribute, record_index=None):
+        model = self.model(attribute, record_index)
+        if model is None:
+            return None
+
+        generated_word = model.make_sentence(tries=100, test_output=False)
+        if generated_word is None:
+            return None
+        return generated_word.strip()
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_models(key):
+    with _cache_lock:
+        models = _cache.get(key)
+        if models is not None:
+            _cache.move_to_end(key)
+        return models
+
+
+def cache_models(key, models):
+    with _cache_lock:
+        _cache[key] = models
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_DATASETS:
+            _cache.popitem(last=False)
+    return models
+
+
+def upload_key(digest):
+    # Key of the models of all attributes of a parsed upload, see upload_parser.parse_upload
+    return (digest, None)
+
+
+def get_models(uploaded_data, attributes):
+    # Parsed uploads carry their models, taken from the cache by upload_parser or trained while
+    # parsing
+    models = getattr(uploaded_data, 'models', None)
+    if models is not None and models.attributes == list(attributes):
+        return models
+
+    digest = getattr(uploaded_data, 'digest', None) or dataset_hash(uploaded_data)
+    key = (digest, tuple(attributes))
+    models = cached_models(key)
+    if models is None:
+        models = cache_models(key, MarkovModels(uploaded_data, attributes))
+    return models
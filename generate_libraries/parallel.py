@@ -0,0 +1,83 @@
+# Description: Process pool mode for gen_libs_master.generate_data. A request is split into shards,
+# every shard is generated in a worker process with random/NumPy/Faker seeds derived from one master
+# seed, and the shards are merged (or streamed) back in order, so a seeded run is reproducible
+# regardless of the number of workers.
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from faker import Faker
+
+from generate_libraries import gen_libs_master
+from generate_libraries.faker_pool import faker_pool
+
+# Number of records generated per shard
+SHARD_SIZE = 10000
+
+
+def derive_seeds(seed, num_seeds):
+    # Independent child seeds of the master seed
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(num_seeds)]
+
+
+def split_records(num_records, shard_size=SHARD_SIZE):
+    return [min(shard_size, num_records - start) for start in range(0, num_records, shard_size)]
+
+
+def _init_worker(pool_seed):
+    # Every worker builds the same Faker pools from the pool seed, so the pool contents do not
+    # depend on which worker generates a shard
+    if pool_seed is not None:
+        faker_pool.reseed(pool_seed)
+
+
+def _generate_shard(jsonType, selected_attributes, uploadedData, num_records, seed, user_num):
+    random.seed(seed)
+    np.random.seed(seed)
+    Faker.seed(seed)
+    data, _ = gen_libs_master.generate_data(jsonType, selected_attributes, uploadedData, num_records, user_num=user_num)
+    return data
+
+
+# Generates the shards in a process pool and yields them in order. At most two shards per worker
+# are in flight, so memory stays bounded when the consumer is slower than the workers.
+# The persons user number is drawn once from the master seed and shared by all shards.
+def iter_shards(jsonType, selected_attributes, uploadedData, num_records, workers=None, seed=None, shard_size=SHARD_SIZE):
+    workers = workers or os.cpu_count() or 1
+    shards = split_records(num_records, shard_size)
+
+    # Forked workers inherit the parent's random state, so unseeded runs still need distinct
+    # shard seeds; only seeded runs rebuild the Faker pools reproducibly
+    reproducible = seed is not None
+    if not reproducible:
+        seed = np.random.SeedSequence().entropy
+    pool_seed, user_seed, *shard_seeds = derive_seeds(seed, len(shards) + 2)
+    user_num = random.Random(user_seed).randint(1, 9999)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pool_seed if reproducible else None,)) as executor:
+        pending = deque()
+        for shard_records, shard_seed in zip(shards, shard_seeds):
+            pending.append(executor.submit(_generate_shard, jsonType, selected_attributes, uploadedData, shard_records, shard_seed, user_num))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# Process pool variant of gen_libs_master.generate_data with the same return values, used by it
+# when workers or a seed are given. Unique attributes stay unique across the shards; their suffixes
+# and the replacements of taken upload values are drawn in this process.
+def generate_data(jsonType, selected_attributes, uploadedData, num_records=1, workers=None, seed=None, shard_size=SHARD_SIZE, results_times=None):
+    results = []
+    if results_times is None:
+        results_times = []
+    shards = iter_shards(jsonType, selected_attributes, uploadedData, num_records, workers, seed, shard_size)
+    if seed is not None:
+        random.seed(seed)
+    for data in gen_libs_master.unique_chunks(shards, jsonType, selected_attributes, uploadedData, num_records):
+        results.extend(data)
+        results_times.extend([time.time()] * len(data))
+    return results, results_times
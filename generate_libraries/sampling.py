@@ -0,0 +1,62 @@
+# Description: Weighted categorical sampling with Walker's alias method in Vose's variant. The
+# probability and alias tables are built once in O(n); a draw is then one uniform index and one
+# biased coin flip regardless of the number of categories, and many draws are vectorized with
+# NumPy. Draws use the global random and np.random generators, so seeding them (as the parallel
+# shards do) makes the draws reproducible.
+import random
+
+import numpy as np
+
+
+class AliasSampler:
+
+    def __init__(self, values, weights):
+        values = list(values)
+        weights = np.asarray(weights, dtype=float)
+        if not values or len(values) != len(weights):
+            raise ValueError("An alias sampler needs one weight per value and at least one value")
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("Weights must be non-negative and sum to a positive value")
+
+        num_values = len(values)
+        scaled = (weights * num_values / weights.sum()).tolist()
+        probability = [1.0] * num_values
+        alias = list(range(num_values))
+        small = [idx for idx, p in enumerate(scaled) if p < 1.0]
+        large = [idx for idx, p in enumerate(scaled) if p >= 1.0]
+
+        # Every small column is filled up by one large column, which keeps the rest of its weight
+        while small and large:
+            small_idx = small.pop()
+            large_idx = large.pop()
+            probability[small_idx] = scaled[small_idx]
+            alias[small_idx] = large_idx
+            scaled[large_idx] += scaled[small_idx] - 1.0
+            (small if scaled[large_idx] < 1.0 else large).append(large_idx)
+
+        self.values = values
+        self.probability = probability
+        self.alias = alias
+        self._probability = np.array(probability)
+        self._alias = np.array(alias)
+        self._values = np.empty(num_values, dtype=object)
+        self._values[:] = values
+
+    @classmethod
+    def from_counts(cls, counts):
+        # counts maps every value to its frequency or weight
+        return cls(counts.keys(), list(counts.values()))
+
+    def __len__(self):
+        return len(self.values)
+
+    def draw(self, size=None):
+        # One value, or a NumPy object array of size values
+        if size is None:
+            idx = random.randrange(len(self.values))
+            return self.values[idx] if random.random() < self.probability[idx] else self.values[self.alias[idx]]
+        return self._values[self.draw_indices(size)]
+
+    def draw_indices(self, size):
+        idx = np.random.randint(0, len(self.values), size)
+        return np.where(np.random.random(size) < self._probability[idx], idx, self._alias[idx])
@@ -0,0 +1,257 @@
+# Description: Schema registry of the JSON types. Every generator module declares its type as a
+# Schema: one generator function per field (and optionally one column generator per field for
+# bulk generation), the function for undeclared attributes, the unique attributes and the
+# attributes that records generated from an upload keep unique. A request compiles the selected
+# attributes once into a flat list of (attribute, function) pairs, so no attribute names are
+# compared per cell, and gen_libs_master looks the type up here instead of dispatching by name.
+# Adding a type means declaring a Schema in a module that gen_libs_master imports.
+import datetime
+import random
+import time
+
+import numpy as np
+
+from generate_libraries import ingestion, markov_cache, uniqueness
+from generate_libraries.faker_pool import faker_pool
+
+REGISTRY = {}
+
+# Schemas with column generators use them for requests of at least this many records
+COLUMNAR_THRESHOLD = 1000
+
+# Records generated per batch of columns; results_times grows after every batch, so progress is
+# reported while a large request is generated
+COLUMNAR_CHUNK_SIZE = 10000
+
+
+class Schema:
+
+    def __init__(self, json_type, fields, default_field, columns=None, default_column=None, unique=(), upload_unique=(), request_context=None):
+        self.json_type = json_type
+        # field(context) -> value, called once per record; the context is a dict shared by the
+        # fields of one record, e.g. for the names userName and email are built from
+        self.fields = fields
+        self.default_field = default_field
+        # column(num_records, context) -> NumPy array of num_records values; the context is shared
+        # by the columns of one request
+        self.columns = columns
+        self.default_column = default_column
+        self.unique = list(unique)
+        # Attributes generate_upload keeps unique by rejecting records with taken values
+        self.upload_unique = list(upload_unique)
+        # request_context() -> dict of request-wide defaults, e.g. a random user number
+        self.request_context = request_context
+
+    def compile(self, attributes):
+        return [(attribute, self.fields.get(attribute, self.default_field)) for attribute in attributes]
+
+    def compile_columns(self, attributes):
+        return [(attribute, self.columns.get(attribute, self.default_column)) for attribute in attributes]
+
+    @property
+    def has_columns(self):
+        return self.columns is not None
+
+    def new_context(self, context=None):
+        # The request defaults, overridden by the values given by the caller
+        new_context = self.request_context() if self.request_context else {}
+        new_context.update({key: value for key, value in (context or {}).items() if value is not None})
+        return new_context
+
+    def generate(self, attributes, num_records, context=None, results_times=None, profile=None):
+        # Generates the records column by column for large requests, record by record otherwise
+        if not self.has_columns or num_records < COLUMNAR_THRESHOLD:
+            return self.generate_rows(attributes, num_records, context, results_times, profile)
+        return self.generate_columnar(attributes, num_records, context, results_times, profile)
+
+    def generate_columnar(self, attributes, num_records, context=None, results_times=None, profile=None, chunk_size=COLUMNAR_CHUNK_SIZE):
+        # Generates the columns in batches of chunk_size records and zips them into records; the
+        # request context and the uniqueness indexes are shared by all batches
+        context = self.new_context(context)
+        unique = self.unique_values(attributes, num_records)
+        if results_times is None:
+            results_times = []
+        data = []
+
+        for start in range(0, num_records, chunk_size):
+            chunk_records = min(chunk_size, num_records - start)
+            columns = self.generate_columns(attributes, chunk_records, context, profile, unique)
+            data.extend(dict(zip(columns.keys(), row)) for row in zip(*columns.values()))
+            results_times.extend([time.time()] * chunk_records)
+
+        return data, results_times
+
+    def unique_values(self, attributes, num_records):
+        return {attribute: uniqueness.UniqueValues(attribute, num_records) for attribute in self.unique if attribute in attributes}
+
+    def generate_rows(self, attributes, num_records, context=None, results_times=None, profile=None):
+        # context holds request-wide values such as the user number; every record gets a copy. An
+        # optional profiling.Profile times every field call.
+        compiled = self.compile(attributes)
+        if profile is not None:
+            compiled = profile.instrument(compiled)
+        context = self.new_context(context)
+        unique = self.unique_values(attributes, num_records)
+        # A caller-provided list is filled while generating, e.g. to report progress
+        if results_times is None:
+            results_times = []
+        data = []
+
+        for _ in range(num_records):
+            record_context = dict(context)
+            record = {attribute: field(record_context) for attribute, field in compiled}
+            start = time.perf_counter_ns()
+            for attribute, unique_values in unique.items():
+                record[attribute] = unique_values.claim(record[attribute])
+            if unique and profile is not None:
+                profile.add_phase('unique', time.perf_counter_ns() - start)
+            data.append(record)
+            results_times.append(time.time())
+
+        return data, results_times
+
+    def generate_columns(self, attributes, num_records, context=None, profile=None, unique=None):
+        # Returns the generated columns as lists keyed by attribute; an optional profiling.Profile
+        # gets the time of every column, counted as num_records calls. unique holds the
+        # UniqueValues of a request generated in several batches.
+        context = self.new_context(context)
+        if unique is None:
+            unique = self.unique_values(attributes, num_records)
+        columns = {}
+        for attribute, column in self.compile_columns(attributes):
+            start = time.perf_counter_ns()
+            columns[attribute] = column(num_records, context).tolist()
+            if profile is not None:
+                profile.add_field(attribute, time.perf_counter_ns() - start, num_records)
+        for attribute, unique_values in unique.items():
+            if attribute in columns:
+                start = time.perf_counter_ns()
+                columns[attribute] = unique_values.claim_all(columns[attribute])
+                if profile is not None:
+                    profile.add_phase('unique', time.perf_counter_ns() - start)
+        return columns
+
+    def generate_upload(self, uploaded_data, num_records=1, per_record=False, results_times=None, unique_index=None):
+        # Generates records with the attributes of the upload, every value drawn from its summary
+        # or its Markov model (see ingestion.make_value) and a pooled word otherwise. Records with
+        # a taken upload_unique value are rejected; a caller-provided unique_index holds the
+        # values taken by earlier chunks of the same stream. A caller-provided results_times list
+        # receives a timestamp per accepted record.
+        if not uploaded_data:
+            return None
+
+        attributes = ingestion.extract_attributes(uploaded_data)
+        models = markov_cache.get_models(uploaded_data, attributes)
+        unique_attributes = [attribute for attribute in self.upload_unique if attribute in attributes]
+        index = unique_index if unique_index is not None else uniqueness.UniqueIndex(num_records)
+        for attribute in unique_attributes:
+            ingestion.check_unique_capacity(uploaded_data, attribute, len(index) + num_records)
+        results = []
+        duplicates = 0
+
+        while len(results) < num_records:
+            # Only the per-record models need a record, so the seeded stream is not advanced otherwise
+            record_index = random.randrange(len(uploaded_data)) if per_record else None
+            record = {}
+            for attribute in attributes:
+                value = ingestion.make_value(uploaded_data, models, attribute, record_index)
+                record[attribute] = value if value is not None else faker_pool.draw('word')
+
+            if unique_attributes and not self._claim_upload_values(index, record):
+                duplicates += 1
+                if duplicates > uniqueness.MAX_CONSECUTIVE_DUPLICATES:
+                    raise uniqueness.UniqueValueExhausted(f"Found only {len(results)} unique {', '.join(unique_attributes)} values, {num_records} were requested")
+                continue
+            duplicates = 0
+            results.append(record)
+            if results_times is not None:
+                results_times.append(time.time())
+
+        return results
+
+    def unique_chunks(self, chunks, attributes, num_records):
+        # Every generated chunk is unique on its own; this keeps the unique attributes unique across
+        # all chunks of a stream by claiming their values once more in one index
+        unique = self.unique_values(attributes, num_records)
+        for chunk in chunks:
+            for record in chunk:
+                for attribute, unique_values in unique.items():
+                    record[attribute] = unique_values.claim(record[attribute])
+            yield chunk
+
+    def unique_upload_chunks(self, chunks, uploaded_data, num_records):
+        # The upload_unique variant of unique_chunks: records whose values were taken by an earlier
+        # chunk are replaced by records generated against the shared index, which raises
+        # UniqueValueExhausted once the upload yields no more unique values
+        if not self.upload_unique:
+            yield from chunks
+            return
+        index = uniqueness.UniqueIndex(num_records)
+        for chunk in chunks:
+            kept = [record for record in chunk if self._claim_upload_values(index, record)]
+            if len(kept) < len(chunk):
+                kept.extend(self.generate_upload(uploaded_data, len(chunk) - len(kept), unique_index=index))
+            yield kept
+
+    def _claim_upload_values(self, index, record):
+        # Claims all upload_unique values of the record, or none if one of them is taken
+        values = [str(record[attribute]) for attribute in self.upload_unique if attribute in record]
+        if any(value in index for value in values):
+            return False
+        for value in values:
+            index.add(value)
+        return True
+
+
+# Field and column generators shared by the schemas
+
+def pooled(provider):
+    def field(context):
+        return faker_pool.draw(provider)
+    return field
+
+
+def pooled_column(provider):
+    def column(num_records, context):
+        return faker_pool.draw(provider, num_records)
+    return column
+
+
+def date_between(start_date, end_date):
+    span = (end_date - start_date).days
+
+    def field(context):
+        return str(start_date + datetime.timedelta(days=random.randint(0, span)))
+    return field
+
+
+def random_dates(start_date, end_date, num_records):
+    # Bulk date sampling as integer day offsets from the start date
+    start = np.datetime64(start_date, 'D')
+    span = (np.datetime64(end_date, 'D') - start).astype(int)
+    offsets = np.random.randint(0, span + 1, size=num_records)
+    return (start + offsets).astype(str).astype(object)
+
+
+def date_column(start_date, end_date):
+    def column(num_records, context):
+        return random_dates(start_date, end_date, num_records)
+    return column
+
+
+def sampled(sampler):
+    def field(context):
+        return sampler.draw()
+    return field
+
+
+def register(schema):
+    REGISTRY[schema.json_type] = schema
+    return schema
+
+
+def get_schema(json_type):
+    schema = REGISTRY.get(json_type)
+    if schema is None:
+        raise ValueError(f"Invalid JSON type: {json_type}")
+    return schema
@@ -0,0 +1,145 @@
+# Description: Uniqueness of generated values. A UniqueIndex remembers the values handed out so far,
+# in an exact hash set for small runs and, once it grows past EXACT_LIMIT values, in a Bloom filter
+# backed by an SQLite spill file that confirms the filter's positives, so memory stays bounded
+# for runs of millions of records. UniqueValues retries a taken value with random numeric
+# suffixes and raises UniqueValueExhausted instead of looping when no free value is found.
+import hashlib
+import math
+import os
+import random
+import sqlite3
+import tempfile
+
+import numpy as np
+
+# Values kept in the exact set before the index switches to the Bloom filter and spill file
+EXACT_LIMIT = 1000000
+
+# False positive rate the Bloom filter is sized for
+BLOOM_ERROR_RATE = 0.001
+
+# Suffixed candidates tried per taken value before giving up
+MAX_RETRIES = 20
+
+# Duplicates drawn in a row after which a generator without suffixes gives up
+MAX_CONSECUTIVE_DUPLICATES = 1000
+
+
+class UniqueValueExhausted(ValueError):
+    pass
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, value):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class UniqueIndex:
+
+    def __init__(self, expected=None, exact_limit=EXACT_LIMIT, error_rate=BLOOM_ERROR_RATE):
+        self.expected = expected
+        self.exact_limit = exact_limit
+        self.error_rate = error_rate
+        self.exact = set()
+        self.bloom = None
+        self.spill = None
+        self.spill_path = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, value):
+        if self.bloom is None:
+            return value in self.exact
+        # The filter rules out most values; its positives are confirmed in the spill file
+        if value not in self.bloom:
+            return False
+        return self.spill.execute("SELECT 1 FROM seen WHERE value = ?", (value,)).fetchone() is not None
+
+    def add(self, value):
+        # Adds the value and returns True, or returns False if it was already taken
+        value = str(value)
+        if value in self:
+            return False
+        if self.bloom is None:
+            self.exact.add(value)
+            if len(self.exact) > self.exact_limit:
+                self._spill()
+        else:
+            self.bloom.add(value)
+            self.spill.execute("INSERT INTO seen VALUES (?)", (value,))
+        self.count += 1
+        return True
+
+    def _spill(self):
+        # Moves the exact set into the Bloom filter and the spill file
+        capacity = max(self.expected or 0, 4 * self.exact_limit)
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        fd, self.spill_path = tempfile.mkstemp(prefix='unique_', suffix='.sqlite')
+        os.close(fd)
+        self.spill = sqlite3.connect(self.spill_path, check_same_thread=False)
+        self.spill.execute("PRAGMA journal_mode = OFF")
+        self.spill.execute("PRAGMA synchronous = OFF")
+        self.spill.execute("CREATE TABLE seen (value TEXT PRIMARY KEY) WITHOUT ROWID")
+        for value in self.exact:
+            self.bloom.add(value)
+        self.spill.executemany("INSERT INTO seen VALUES (?)", ((value,) for value in self.exact))
+        self.exact = set()
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            os.remove(self.spill_path)
+            self.spill = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def with_suffix(value, suffix):
+    # Email addresses keep their domain, the suffix goes before the '@'
+    local_part, at, domain = value.partition('@')
+    return f"{local_part}{suffix}{at}{domain}" if at else f"{value}{suffix}"
+
+
+class UniqueValues:
+    # Hands out unique values of one attribute
+
+    def __init__(self, attribute, expected=None, max_retries=MAX_RETRIES, index=None):
+        self.attribute = attribute
+        self.max_retries = max_retries
+        self.index = index if index is not None else UniqueIndex(expected)
+
+    def claim(self, value):
+        if self.index.add(value):
+            return value
+        # Suffixes get longer with every retry, so a crowded value space is left quickly
+        for attempt in range(self.max_retries):
+            candidate = with_suffix(str(value), random.randint(1, 10 ** (2 + attempt // 4)))
+            if self.index.add(candidate):
+                return candidate
+        raise UniqueValueExhausted(f"No unique {self.attribute} found for {value!r} after {self.max_retries} retries")
+
+    def claim_all(self, values):
+        return [self.claim(value) for value in values]
@@ -0,0 +1,150 @@
+# Description: Incremental parser for uploaded seed files. The upload is read in chunks and decoded
+# record by record, either from a JSON array or from newline-delimited JSON, so the file is never
+# held in memory as a whole. Raw line breaks inside string values are accepted as they are
+# (strict=False) instead of being replaced beforehand. The records are passed on to the ingestion
+# (summary statistics and Markov training) as they are parsed. The SHA-256 of the uploaded bytes
+# keys the model cache: a seekable upload is hashed before it is parsed, so the upload of a known
+# dataset reuses its cached models instead of training them again.
+import codecs
+import hashlib
+import json
+import re
+
+from generate_libraries import ingestion, markov_cache
+
+# Bytes read from the upload per chunk
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# A decode error this close to the end of the buffer may come from a literal or escape cut off by
+# the chunk boundary (e.g. 'tru' or '\\u00'), so it is retried with the next chunk
+MAX_CUT_TOKEN = 6
+
+
+def _cut_off(error, buffer):
+    # Whether the record failed because the buffer ends inside it, rather than being malformed
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return len(buffer) - error.pos <= MAX_CUT_TOKEN
+
+
+def iter_records(stream, chunk_size=CHUNK_SIZE, digest=None):
+    # Yields the objects of a JSON array or of NDJSON read from a binary stream; an optional
+    # hashlib object is updated with every chunk read
+    decoder = json.JSONDecoder(strict=False)
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    pos = 0
+    # Characters, line breaks and the column of the last line dropped from the buffer so far, so
+    # errors report their position in the upload rather than in the buffer
+    consumed = 0
+    consumed_lines = 0
+    line_column = 0
+    eof = False
+    in_array = None
+    # Inside an array: 'first' before the first element, 'value' after a comma and 'separator'
+    # after an element
+    expect = 'first'
+
+    def read_chunk():
+        # Appends the next chunk to the unparsed rest of the buffer
+        nonlocal buffer, pos, eof, consumed, consumed_lines, line_column
+        chunk = stream.read(chunk_size)
+        if digest is not None:
+            digest.update(chunk)
+        line_breaks = buffer.count('\n', 0, pos)
+        if line_breaks:
+            line_column = pos - buffer.rfind('\n', 0, pos) - 1
+        else:
+            line_column += pos
+        consumed += pos
+        consumed_lines += line_breaks
+        buffer = buffer[pos:] + text_decoder.decode(chunk, final=not chunk)
+        pos = 0
+        eof = not chunk
+
+    def decode_error(msg, error_pos):
+        # A JSONDecodeError at error_pos of the buffer, with its position in the whole upload
+        error = json.JSONDecodeError(msg, buffer, error_pos)
+        line_start = buffer.rfind('\n', 0, error_pos)
+        error.pos = consumed + error_pos
+        error.lineno = consumed_lines + buffer.count('\n', 0, error_pos) + 1
+        error.colno = error_pos - line_start if line_start >= 0 else line_column + error_pos + 1
+        error.args = (f"{msg}: line {error.lineno} column {error.colno} (char {error.pos})",)
+        return error
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+
+        if pos == len(buffer) and not eof:
+            read_chunk()
+            continue
+
+        if pos == len(buffer):
+            if in_array:
+                raise decode_error("Unterminated array", pos)
+            return
+
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+            continue
+
+        if in_array:
+            if buffer[pos] == ']' and expect != 'value':
+                return
+            if expect == 'separator':
+                if buffer[pos] != ',':
+                    raise decode_error("Expecting ',' delimiter", pos)
+                pos += 1
+                expect = 'value'
+                continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof or not _cut_off(e, buffer):
+                raise decode_error(e.msg, e.pos) from None
+            # The record continues in the next chunk
+            read_chunk()
+            continue
+
+        if not isinstance(record, dict):
+            raise decode_error("Uploaded records must be JSON objects", pos)
+        pos = end
+        expect = 'separator'
+        yield record
+
+
+def hash_upload(stream, chunk_size=CHUNK_SIZE):
+    # The SHA-256 of the rest of a seekable stream, which is rewound afterwards; None for streams
+    # that can only be read once
+    if not (hasattr(stream, 'seekable') and stream.seekable()):
+        return None
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(start)
+    return digest
+
+
+def parse_upload(stream, chunk_size=CHUNK_SIZE, sample_size=ingestion.RESERVOIR_SIZE):
+    # Returns the ingestion.DatasetSummary of the upload, built in one pass over the stream. The
+    # Markov models are trained only for bytes not seen before; otherwise the upload is hashed
+    # while it is parsed and its models are cached afterwards.
+    digest = hash_upload(stream, chunk_size)
+    if digest is None:
+        digest = hashlib.sha256()
+        summary = ingestion.ingest(iter_records(stream, chunk_size, digest), digest=digest, sample_size=sample_size)
+        markov_cache.cache_models(markov_cache.upload_key(summary.digest), summary.models)
+        return summary
+
+    key = markov_cache.upload_key(digest.hexdigest())
+    cached = markov_cache.cached_models(key)
+    summary = ingestion.ingest(iter_records(stream, chunk_size), digest=digest, sample_size=sample_size, corpus_models=cached.corpus_models if cached is not None else None)
+    if cached is None:
+        markov_cache.cache_models(key, summary.models)
+    return summary
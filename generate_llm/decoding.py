@@ -0,0 +1,178 @@
+# Description: Batched generation helpers for the GPT-Neo models. Prompts are left-padded so a
+# batch of different prompts can be decoded together, identical prompts are expanded with
+# num_return_sequences, and the batch size is picked from a memory budget. Repeated prompts can be
+# encoded once and sampled from their cached key/value state.
+import copy
+import threading
+
+import torch
+from transformers import StoppingCriteriaList
+
+import profiling
+from generate_llm import stopping
+
+# Memory one generation batch may use for its KV cache and logits
+MEMORY_BUDGET_MB = 1024
+MAX_BATCH_SIZE = 64
+
+# Sampling defaults of model.generate
+TOP_K = 50
+TEMPERATURE = 1.0
+
+# Number of encoded prompt prefixes kept per process
+MAX_CACHED_PREFIXES = 16
+
+
+def prepare_tokenizer(tokenizer):
+    # GPT-2 tokenizers have no pad token; decoder-only models need left padding for batching
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = 'left'
+    return tokenizer
+
+
+def bytes_per_sequence(model, prompt_tokens, max_new_tokens):
+    config = model.config
+    bytes_per_value = next(model.parameters()).element_size()
+    seq_len = prompt_tokens + max_new_tokens
+    # Keys and values of every layer for the full sequence, the logits of the prompt forward
+    # pass and of one decoding step
+    kv_cache = 2 * config.num_layers * config.hidden_size * seq_len
+    logits = (prompt_tokens + 1) * config.vocab_size
+    return (kv_cache + logits) * bytes_per_value
+
+
+def pick_batch_size(model, prompt_tokens, max_new_tokens, memory_budget_mb=MEMORY_BUDGET_MB, max_batch_size=MAX_BATCH_SIZE):
+    # Largest batch whose estimated memory fits the budget
+    batch_size = int(memory_budget_mb * 1024 * 1024 // bytes_per_sequence(model, prompt_tokens, max_new_tokens))
+    return max(1, min(max_batch_size, batch_size))
+
+
+def count_tokens(tokenizer, new_tokens, token_stats):
+    # Tokens the batch decoded versus tokens that ended up in a generated object
+    if token_stats is not None:
+        token_stats['generated'] = token_stats.get('generated', 0) + new_tokens.numel()
+        token_stats['used'] = token_stats.get('used', 0) + sum(stopping.object_token_counts(tokenizer, new_tokens))
+
+
+# Samples num_return_sequences continuations per prompt in one batch and returns the generated
+# texts without the prompts. Every sequence stops once it has produced a balanced {...} object.
+# An optional profiling.Profile gets the tokenize (encoding and decoding) and generate phases.
+def generate_texts(loaded, prompts, num_return_sequences=1, max_new_tokens=200, token_stats=None, profile=None):
+    tokenizer = loaded.tokenizer
+    with profiling.phase(profile, 'tokenize'):
+        inputs = tokenizer(prompts, return_tensors='pt', padding=True).to(loaded.device)
+
+    with torch.no_grad(), profiling.phase(profile, 'generate'):
+        output_ids = loaded.model.generate(
+            **inputs,
+            do_sample=True,
+            max_new_tokens=max_new_tokens,
+            num_return_sequences=num_return_sequences,
+            pad_token_id=tokenizer.pad_token_id,
+            stopping_criteria=StoppingCriteriaList([stopping.BalancedJsonStoppingCriteria(tokenizer)]),
+        )
+
+    new_tokens = output_ids[:, inputs['input_ids'].shape[1]:]
+    count_tokens(tokenizer, new_tokens, token_stats)
+    with profiling.phase(profile, 'tokenize'):
+        return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+
+class PrefixCache:
+
+    def __init__(self, input_ids, past_key_values, next_token_logits):
+        self.input_ids = input_ids
+        self.past_key_values = past_key_values
+        self.next_token_logits = next_token_logits
+
+    @property
+    def length(self):
+        return self.input_ids.shape[1]
+
+
+_prefix_caches = {}
+_prefix_lock = threading.Lock()
+
+
+def encode_prefix(loaded, prompt, profile=None):
+    # Runs the prompt through the model once and keeps its key/value state
+    key = (loaded.model_name, prompt)
+    prefix = _prefix_caches.get(key)
+    if prefix is not None:
+        return prefix
+
+    with profiling.phase(profile, 'tokenize'):
+        input_ids = loaded.tokenizer(prompt, return_tensors='pt')['input_ids'].to(loaded.device)
+    with torch.no_grad(), profiling.phase(profile, 'generate'):
+        outputs = loaded.model(input_ids, use_cache=True)
+    prefix = PrefixCache(input_ids, outputs.past_key_values, outputs.logits[:, -1, :])
+
+    with _prefix_lock:
+        if len(_prefix_caches) >= MAX_CACHED_PREFIXES:
+            _prefix_caches.pop(next(iter(_prefix_caches)))
+        _prefix_caches[key] = prefix
+    return prefix
+
+
+def expand_past(past_key_values, batch_size):
+    # The model extends the cache in place, so every batch works on its own copy
+    if hasattr(past_key_values, 'batch_repeat_interleave'):
+        past = copy.deepcopy(past_key_values)
+        past.batch_repeat_interleave(batch_size)
+        return past
+    return tuple(tuple(tensor.repeat(batch_size, 1, 1, 1) for tensor in layer) for layer in past_key_values)
+
+
+def sample_next_tokens(scores, top_k=TOP_K, temperature=TEMPERATURE):
+    scores = scores / temperature
+    if top_k:
+        kth_best = torch.topk(scores, min(top_k, scores.shape[-1]), dim=-1).values[:, -1, None]
+        scores = scores.masked_fill(scores < kth_best, float('-inf'))
+    return torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+
+
+# Samples num_sequences continuations of the prompt starting from its cached key/value state,
+# so only the generated tokens run through the model. A sequence stops once it has produced a
+# balanced {...} object; an optional constraint (see json_constraint.JsonConstraint) also masks
+# the logits of every step. Returns the generated texts.
+def sample_from_prefix(loaded, prompt, num_sequences, max_new_tokens=200, top_k=TOP_K, temperature=TEMPERATURE, constraint=None, token_stats=None, profile=None):
+    model = loaded.model
+    tokenizer = loaded.tokenizer
+    prefix = encode_prefix(loaded, prompt, profile)
+
+    past_key_values = expand_past(prefix.past_key_values, num_sequences)
+    logits = prefix.next_token_logits.expand(num_sequences, -1)
+    attention_mask = torch.ones((num_sequences, prefix.length), dtype=torch.long, device=loaded.device)
+    finished = torch.zeros(num_sequences, dtype=torch.bool, device=loaded.device)
+    generated = []
+    tracker = stopping.JsonObjectTracker(num_sequences)
+    if constraint is not None:
+        constraint.start(num_sequences, loaded.device, max_new_tokens)
+
+    with torch.no_grad(), profiling.phase(profile, 'generate'):
+        for _ in range(max_new_tokens):
+            scores = logits.float()
+            if constraint is not None:
+                scores = constraint.mask(scores)
+            next_tokens = sample_next_tokens(scores, top_k, temperature)
+            next_tokens = next_tokens.masked_fill(finished, tokenizer.pad_token_id)
+            generated.append(next_tokens)
+            finished |= next_tokens == tokenizer.eos_token_id
+            if constraint is not None:
+                constraint.advance(next_tokens)
+                finished |= constraint.finished
+            tracker.update([stopping.token_text(tokenizer, token_id) for token_id in next_tokens.tolist()])
+            finished |= torch.tensor(tracker.done, device=finished.device)
+            if finished.all():
+                break
+
+            attention_mask = torch.cat([attention_mask, torch.ones_like(attention_mask[:, :1])], dim=1)
+            outputs = model(input_ids=next_tokens[:, None], past_key_values=past_key_values, attention_mask=attention_mask, use_cache=True)
+            past_key_values = outputs.past_key_values
+            logits = outputs.logits[:, -1, :]
+
+    new_tokens = torch.stack(generated, dim=1)
+    count_tokens(tokenizer, new_tokens, token_stats)
+    with profiling.phase(profile, 'tokenize'):
+        return tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
@@ -1,18 +1,33 @@
-import json
-import json
 import re
 import time
-import torch
-from transformers import GPTNeoForCausalLM, GPT2Tokenizer, pipeline
-from datasets import Dataset
 
-result_times = []
-valid_result = []
+import profiling
+import serializer
 
-def generate_data(jsonType, uploadedData, num_records):
+from generate_llm import decoding, json_constraint, model_registry, stopping
+
+# Number of records generated per chunk when streaming
+STREAM_CHUNK_SIZE = 8
+
+# Token budget per sample; None derives it from the measured record lengths of the type
+MAX_NEW_TOKENS = None
+
+# Encode the shared prompt once and sample every record from its cached key/value state
+USE_PREFIX_CACHE = True
+
+# Mask the logits with the JSON schema of the type so every sample is a valid object. Constrained
+# sampling always runs from the cached prompt prefix.
+USE_CONSTRAINED_DECODING = True
+
+# Caller-provided containers receive the per-record timestamps (results_times), the seconds spent
+# loading the model versus generating (phase_times) and the tokens decoded versus the tokens that
+# ended up in a generated object (token_stats). Nothing is kept between calls, so concurrent
+# requests do not share any state. An optional profiling.Profile gets the model load, tokenize,
+# generate, regex extract and JSON parse phases.
+def generate_data(jsonType, uploadedData, num_records, results_times=None, phase_times=None, token_stats=None, profile=None):
 
     if jsonType == 'persons':
-        return generate_persons(uploadedData, num_records)
+        return generate_persons(uploadedData, num_records, results_times=results_times, phase_times=phase_times, token_stats=token_stats, profile=profile)
     elif jsonType == 'badges':
         return generate_badges(uploadedData, num_records)
     elif jsonType == 'activities':
@@ -23,29 +38,44 @@ def generate_data(jsonType, uploadedData, num_records):
         return generate_goals(uploadedData, num_records)
     else:
         return []
-    
-def generate_persons(prompts, num_records):
-    model_name = "gpt_neo_finetuned"
-    tokenizer = GPT2Tokenizer.from_pretrained(model_name)
-    model = GPTNeoForCausalLM.from_pretrained(model_name)
 
-    # Set the device to GPU if available
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model.to(device)
 
-    # Set the generator pipeline
-    generator = pipeline('text-generation', model=model, tokenizer=tokenizer, device=device)
+# Generator variant of generate_data which yields the records chunk by chunk
+def iter_data(jsonType, uploadedData, num_records, chunk_size=STREAM_CHUNK_SIZE):
+    remaining = num_records
+    while remaining > 0:
+        chunk_records = min(chunk_size, remaining)
+        generated = generate_data(jsonType, uploadedData, chunk_records)
+        if not generated:
+            return
+        yield from generated[0]
+        remaining -= chunk_records
+
+
+def generate_persons(prompts, num_records, batch_size=None, prefix_cache=USE_PREFIX_CACHE, constrained=USE_CONSTRAINED_DECODING, max_new_tokens=MAX_NEW_TOKENS, results_times=None, phase_times=None, token_stats=None, profile=None):
+    if results_times is None:
+        results_times = []
+    if phase_times is None:
+        phase_times = {}
+    if token_stats is None:
+        token_stats = {}
+
+    # The model is loaded on the first request only and kept warm afterwards
+    with profiling.phase(profile, 'model_load'):
+        loaded, phase_times['model_load'] = model_registry.get_model(model_registry.PERSONS_MODEL)
 
     def extract_json_objects(generated_texts):
         pattern = r'\{\s*"userName":\s*"[^"]+",\s*"password":\s*"[^"]+",\s*"email":\s*"[^"]+",\s*"firstName":\s*"([^"]+)",\s*"lastName":\s*"([^"]+)",\s*"birthDate":\s*"[^"]+"\s*\}'
         extracted_data = []
         
         for text in generated_texts:
-            match = re.search(pattern, text, re.DOTALL)
+            with profiling.phase(profile, 'regex_extract'):
+                match = re.search(pattern, text, re.DOTALL)
             if match:
                 extracted_json = match.group(0)
                 try:
-                    person_data = json.loads(extracted_json)
+                    with profiling.phase(profile, 'json_parse'):
+                        person_data = serializer.loads(extracted_json)
                     # Correct firstName and lastName to title case
                     person_data['firstName'] = person_data['firstName'].title()
                     person_data['lastName'] = person_data['lastName'].title()
@@ -54,69 +84,77 @@ def generate_persons(prompts, num_records):
                     if not any(char.isdigit() for char in person_data['firstName']) and \
                        not any(char.isdigit() for char in person_data['lastName']):
                         extracted_data.append(person_data)
-                except json.JSONDecodeError:
+                except ValueError:
                     print(f"Error decoding JSON: {extracted_json}")
             else:
                 print(f"Invalid JSON format: {text}")
         
         return extracted_data
 
-    prompts = [
-        f"""Generate a JSON object with the following properties:
-        "userName": {{
+    prompt = """Generate a JSON object with the following properties:
+        "userName": {
             "type": "string",
             "description": "The username of the person, for a volunteering platform"
-        }},
-        "password": {{
+        },
+        "password": {
             "type": "string",
             "description": "a password one person would choose"
-        }},
-        "email": {{
+        },
+        "email": {
             "type": "string",
             "description": "the mail address of the person, most of the users are from Austria, so use reasonable domains. Make sure the address is not usually using another name than the first and last names generated"
-        }},
-        "firstName": {{
+        },
+        "firstName": {
             "type": "string",
             "description": "the first name of the person. most of the users are from Austria, so use reasonable names"
-        }},
-        "lastName": {{
+        },
+        "lastName": {
             "type": "string",
             "description": "the last name of the person. most of the users are from Austria, so use reasonable names"
-        }},
-        "birthDate": {{
+        },
+        "birthDate": {
             "type": "string",
             "description": "the birth date of the person"
-        }}
+        }
         JSON object:
-        """ for _ in range(num_records)
-    ]
+        """
+
+    if max_new_tokens is None:
+        max_new_tokens = stopping.token_budget(loaded.tokenizer, 'persons')
+
+    # All prompts are identical, so a batch is one prompt with num_return_sequences samples
+    if batch_size is None:
+        with profiling.phase(profile, 'tokenize'):
+            prompt_tokens = len(loaded.tokenizer(prompt)['input_ids'])
+        batch_size = decoding.pick_batch_size(loaded.model, prompt_tokens, max_new_tokens)
 
-    dataset = Dataset.from_dict({"prompts": prompts})
-    
     generated_persons = []
-    batch_size = 1  
-    
-    result_times.clear()
-    valid_result.clear()
+    valid_result = []
+
+    inference_start = time.time()
     while len(generated_persons) < num_records:
-        for i in range(0, len(prompts), batch_size):
-            batch_prompts = dataset["prompts"][i:i+batch_size]
-            batch_outputs = generator(batch_prompts, max_new_tokens=200, num_return_sequences=1, do_sample=True)
-            generated_texts = [output[0]['generated_text'] for output in batch_outputs]
-            extracted_data = extract_json_objects(generated_texts)
+        # The memory budget bounds a batch, the records still missing bound it further, so a small
+        # request does not decode samples nobody asked for; invalid samples are made up next round
+        num_samples = min(batch_size, num_records - len(generated_persons))
+        if constrained:
+            constraint = json_constraint.JsonConstraint(loaded.tokenizer, 'persons')
+            generated_texts = decoding.sample_from_prefix(loaded, prompt, num_samples, max_new_tokens=max_new_tokens, constraint=constraint, token_stats=token_stats, profile=profile)
+        elif prefix_cache:
+            generated_texts = decoding.sample_from_prefix(loaded, prompt, num_samples, max_new_tokens=max_new_tokens, token_stats=token_stats, profile=profile)
+        else:
+            generated_texts = decoding.generate_texts(loaded, [prompt], num_return_sequences=num_samples, max_new_tokens=max_new_tokens, token_stats=token_stats, profile=profile)
+        batch_time = time.time()
+        for text in generated_texts:
+            extracted_data = extract_json_objects([text])
             generated_persons.extend(extracted_data)
-            result_times.append(time.time())
-            if extracted_data != []:
-                valid_result.append(True)
-            else:
-                valid_result.append(False)
-           
-            if len(generated_persons) >= num_records:
-                break
-    print(result_times)
+            results_times.append(batch_time)
+            valid_result.append(extracted_data != [])
+
+    phase_times['inference'] = time.time() - inference_start
+    print(results_times)
     print("Gen pers",generated_persons)
     print("Valid result",valid_result)
-    return generated_persons[:num_records], result_times, valid_result
+    return generated_persons[:num_records], results_times, valid_result
 
 
 def generate_badges(selected_attributes, uploadedData, num_records):
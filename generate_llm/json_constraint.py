@@ -0,0 +1,130 @@
+# Description: Grammar-constrained decoding for the JSON types. A schema is compiled into the JSON
+# skeleton of one object (keys in order, punctuation and indentation) with free string values in
+# between. During sampling the skeleton tokens are forced, string values may only use tokens that
+# cannot break out of the string, and a sequence is finished as soon as the closing brace is
+# emitted, so every sample parses as JSON. Given the max_new_tokens of the sampling loop, a value is
+# closed early once the remaining steps are just enough for the rest of the skeleton, so a sample is
+# never cut off by the token budget.
+import json
+import re
+
+import torch
+
+# Per-type schemas: 'string' for a string value, a dict for a nested object and a list for a
+# fixed-length array. allow_empty permits "" values. Only the persons generator samples from the
+# LLM so far; a type gets its schema here once its generator does.
+SCHEMAS = {
+    'persons': {
+        'fields': {
+            'userName': 'string',
+            'password': 'string',
+            'email': 'string',
+            'firstName': 'string',
+            'lastName': 'string',
+            'birthDate': 'string',
+        },
+        'allow_empty': False,
+    },
+}
+
+# Longest string value in tokens before the closing quote is forced
+MAX_VALUE_TOKENS = 32
+
+_VALUE_MARKER = '@@value@@'
+
+
+def _template(fields):
+    if isinstance(fields, dict):
+        return {key: _template(value) for key, value in fields.items()}
+    if isinstance(fields, list):
+        return [_template(value) for value in fields]
+    return _VALUE_MARKER
+
+
+def skeleton_literals(json_type):
+    # The literal JSON text around the string values, e.g. '{\n    "userName": "' and '",\n ...'
+    text = json.dumps(_template(SCHEMAS[json_type]['fields']), indent=4, ensure_ascii=False)
+    return text.split(_VALUE_MARKER)
+
+
+_value_masks = {}
+
+
+def value_token_mask(tokenizer):
+    # Tokens allowed inside a JSON string: no quote, backslash or control character
+    key = id(tokenizer)
+    if key not in _value_masks:
+        vocab_size = len(tokenizer)
+        mask = torch.zeros(vocab_size, dtype=torch.bool)
+        forbidden = re.compile(r'["\\\x00-\x1f]')
+        for token_id in range(vocab_size):
+            text = tokenizer.decode([token_id])
+            mask[token_id] = bool(text) and not forbidden.search(text)
+        mask[tokenizer.all_special_ids] = False
+        _value_masks[key] = mask
+    return _value_masks[key]
+
+
+class JsonConstraint:
+
+    def __init__(self, tokenizer, json_type, max_value_tokens=MAX_VALUE_TOKENS):
+        self.literals = [tokenizer.encode(literal) for literal in skeleton_literals(json_type)]
+        self.min_value_tokens = 0 if SCHEMAS[json_type]['allow_empty'] else 1
+        self.max_value_tokens = max_value_tokens
+        self.value_mask = value_token_mask(tokenizer)
+        # Fewest tokens that complete the object from the start of literal i: the literals from i
+        # on and the shortest values between them
+        self.tail_tokens = [sum(len(literal) for literal in self.literals[idx:]) + self.min_value_tokens * (len(self.literals) - 1 - idx) for idx in range(len(self.literals))]
+        self.finished = None
+
+    def start(self, num_sequences, device, max_new_tokens=None):
+        # Every sequence starts at the first token of the opening literal
+        self.max_new_tokens = max_new_tokens
+        self.steps = 0
+        self.literal_index = [0] * num_sequences
+        self.literal_pos = [0] * num_sequences
+        self.in_value = [False] * num_sequences
+        self.value_tokens = [0] * num_sequences
+        self.finished = torch.zeros(num_sequences, dtype=torch.bool, device=device)
+
+    def mask(self, scores):
+        allowed = torch.zeros_like(scores, dtype=torch.bool)
+        value_mask = self.value_mask.to(scores.device)
+        for idx in range(scores.shape[0]):
+            if self.finished[idx]:
+                allowed[idx] = True
+                continue
+            literal = self.literals[self.literal_index[idx]]
+            if not self.in_value[idx]:
+                allowed[idx, literal[self.literal_pos[idx]]] = True
+                continue
+            # Inside a value: keep writing the string or close it with the next literal, which is
+            # forced once the remaining steps only leave room for the rest of the skeleton
+            closing = self.max_new_tokens is not None and self.max_new_tokens - self.steps <= self.tail_tokens[self.literal_index[idx]]
+            if self.value_tokens[idx] < self.max_value_tokens and (not closing or self.value_tokens[idx] < self.min_value_tokens):
+                allowed[idx, :value_mask.shape[0]] = value_mask
+            if self.value_tokens[idx] >= self.min_value_tokens:
+                allowed[idx, literal[0]] = True
+        return scores.masked_fill(~allowed, float('-inf'))
+
+    def advance(self, next_tokens):
+        self.steps += 1
+        for idx, token in enumerate(next_tokens.tolist()):
+            if self.finished[idx]:
+                continue
+            literal = self.literals[self.literal_index[idx]]
+            if self.in_value[idx]:
+                if token != literal[0]:
+                    self.value_tokens[idx] += 1
+                    continue
+                self.in_value[idx] = False
+                self.literal_pos[idx] = 0
+            self.literal_pos[idx] += 1
+            if self.literal_pos[idx] == len(literal):
+                if self.literal_index[idx] == len(self.literals) - 1:
+                    # The closing brace has been emitted
+                    self.finished[idx] = True
+                else:
+                    self.literal_index[idx] += 1
+                    self.in_value[idx] = True
+                    self.value_tokens[idx] = 0
@@ -0,0 +1,65 @@
+# Description: Loads the fine-tuned GPT-Neo models once per process and keeps them warm, so a
+# generation request only pays for inference. The load time of every model is recorded so it can
+# be reported separately from the inference time.
+import threading
+import time
+
+import torch
+from transformers import GPTNeoForCausalLM, GPT2Tokenizer
+
+from generate_llm import decoding
+
+PERSONS_MODEL = "gpt_neo_finetuned"
+
+
+class LoadedModel:
+
+    def __init__(self, model_name, tokenizer, model, device, load_time):
+        self.model_name = model_name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.device = device
+        self.load_time = load_time
+
+
+_models = {}
+_lock = threading.Lock()
+
+
+def load_model(model_name):
+    start_time = time.time()
+    tokenizer = decoding.prepare_tokenizer(GPT2Tokenizer.from_pretrained(model_name))
+    model = GPTNeoForCausalLM.from_pretrained(model_name)
+
+    # Set the device to GPU if available
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model.to(device)
+    model.eval()
+    return LoadedModel(model_name, tokenizer, model, device, time.time() - start_time)
+
+
+# Returns the loaded model and the seconds this call spent loading it (0 when it was already warm)
+def get_model(model_name):
+    loaded = _models.get(model_name)
+    if loaded is not None:
+        return loaded, 0.0
+
+    with _lock:
+        loaded = _models.get(model_name)
+        if loaded is not None:
+            return loaded, 0.0
+        loaded = load_model(model_name)
+        _models[model_name] = loaded
+
+    print(f"Loaded {model_name} in {loaded.load_time:.2f} s")
+    return loaded, loaded.load_time
+
+
+def warm_up(model_names=(PERSONS_MODEL,)):
+    # Load the models the LLM generators use ahead of the first request; missing models are skipped
+    for model_name in model_names:
+        try:
+            get_model(model_name)
+        except OSError as e:
+            print(f"Could not warm up {model_name}: {e}")
+
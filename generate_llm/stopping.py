@@ -0,0 +1,106 @@
+# Description: Early stopping and token budgets for LLM generation. A sequence is stopped as soon
+# as it has produced one balanced top-level {...} object, and max_new_tokens is derived per JSON
+# type from the token lengths of the records in its dataset instead of a fixed budget.
+import json
+import os
+
+import torch
+from transformers import StoppingCriteria
+
+# Datasets the per-type token budgets are measured on
+DATASETS = {
+    'persons': 'person_dataset.json',
+    'activities': 'activities.json',
+    'badges': 'realistic_badges.json',
+}
+
+# Headroom on top of the longest measured record
+BUDGET_FACTOR = 1.25
+BUDGET_MARGIN = 16
+
+_token_texts = {}
+_budgets = {}
+
+
+def token_text(tokenizer, token_id):
+    texts = _token_texts.setdefault(id(tokenizer), {})
+    if token_id not in texts:
+        texts[token_id] = tokenizer.decode([token_id])
+    return texts[token_id]
+
+
+class JsonObjectTracker:
+    # Follows the generated text of every sequence and records the step at which its first
+    # top-level object was closed; quotes and braces inside strings are ignored
+
+    def __init__(self, num_sequences):
+        self.depth = [0] * num_sequences
+        self.in_string = [False] * num_sequences
+        self.escape = [False] * num_sequences
+        self.end = [None] * num_sequences
+        self.steps = 0
+
+    @property
+    def done(self):
+        return [end is not None for end in self.end]
+
+    def update(self, texts):
+        self.steps += 1
+        for idx, text in enumerate(texts):
+            if self.end[idx] is not None:
+                continue
+            for char in text:
+                if self.in_string[idx]:
+                    if self.escape[idx]:
+                        self.escape[idx] = False
+                    elif char == '\\':
+                        self.escape[idx] = True
+                    elif char == '"':
+                        self.in_string[idx] = False
+                elif char == '"' and self.depth[idx] > 0:
+                    self.in_string[idx] = True
+                elif char == '{':
+                    self.depth[idx] += 1
+                elif char == '}' and self.depth[idx] > 0:
+                    self.depth[idx] -= 1
+                    if self.depth[idx] == 0:
+                        self.end[idx] = self.steps
+                        break
+
+
+class BalancedJsonStoppingCriteria(StoppingCriteria):
+    # Per-sequence stopping criterion for model.generate and the generation pipeline
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.tracker = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.tracker is None:
+            self.tracker = JsonObjectTracker(input_ids.shape[0])
+        self.tracker.update([token_text(self.tokenizer, token_id) for token_id in input_ids[:, -1].tolist()])
+        return torch.tensor(self.tracker.done, dtype=torch.bool, device=input_ids.device)
+
+
+def object_token_counts(tokenizer, new_tokens):
+    # Number of generated tokens up to the end of the first object per sequence, 0 without object
+    tracker = JsonObjectTracker(new_tokens.shape[0])
+    for step in range(new_tokens.shape[1]):
+        tracker.update([token_text(tokenizer, token_id) for token_id in new_tokens[:, step].tolist()])
+        if all(tracker.done):
+            break
+    return [end or 0 for end in tracker.end]
+
+
+def token_budget(tokenizer, json_type, default=200):
+    # max_new_tokens for a type, measured once on the formatting the constrained decoder emits
+    key = (id(tokenizer), json_type)
+    if key not in _budgets:
+        file_path = os.path.join(os.path.dirname(__file__), DATASETS.get(json_type, ''))
+        if json_type not in DATASETS or not os.path.exists(file_path):
+            return default
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        max_token_count = max(len(tokenizer.encode(json.dumps(record, indent=4, ensure_ascii=False))) for record in records)
+        _budgets[key] = int(max_token_count * BUDGET_FACTOR) + BUDGET_MARGIN
+    return _budgets[key]
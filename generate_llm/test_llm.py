@@ -1,7 +1,9 @@
 import json
 import re
 import torch
-from transformers import GPTNeoForCausalLM, GPT2Tokenizer, set_seed, pipeline
+from transformers import GPTNeoForCausalLM, GPT2Tokenizer, StoppingCriteriaList, set_seed, pipeline
+
+from generate_llm import stopping
 
 # Load your fine-tuned model and tokenizer
 model_name = "./gpt_neo_multitask_finetuned"  # Replace with the path to your fine-tuned model
@@ -172,7 +174,10 @@ def generate_activity_data():
     }
     """
 
-    output = generator(prompt, max_new_tokens=700, num_return_sequences=1, do_sample=True)[0]
+    # Stop once the object is closed instead of always decoding the full budget
+    max_new_tokens = stopping.token_budget(tokenizer, 'activities', default=700)
+    stopping_criteria = StoppingCriteriaList([stopping.BalancedJsonStoppingCriteria(tokenizer)])
+    output = generator(prompt, max_new_tokens=max_new_tokens, num_return_sequences=1, do_sample=True, stopping_criteria=stopping_criteria)[0]
     generated_text = output['generated_text']
     print("Generated Text:",generated_text)
 
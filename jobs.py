@@ -0,0 +1,115 @@
+# Description: Background jobs for large generation requests. A job runs in a thread pool per
+# generation method with a configurable concurrency limit; its progress is the number of
+# per-record timestamps the generator has appended so far, the same timestamps that feed
+# results_times in the time metrics.
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of jobs running at the same time per generation method, further jobs are queued
+METHOD_CONCURRENCY = {
+    'Python Libraries': 4,
+    'Large Language Model': 1,
+}
+DEFAULT_CONCURRENCY = 2
+
+# Seconds a finished job and its result are kept
+JOB_TTL = 3600
+
+
+class Job:
+
+    def __init__(self, method, json_type, num_records):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.json_type = json_type
+        self.num_records = num_records
+        self.status = 'queued'
+        # Filled by the generator with one timestamp per generated record (or attempt)
+        self.results_times = []
+        # Value returned by the job function, e.g. the id of its result file
+        self.result = None
+        self.time_metrics = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'failed')
+
+    def progress(self):
+        completed = min(len(self.results_times), self.num_records) if self.status != 'finished' else self.num_records
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0
+        return {
+            'completed': completed,
+            'total': self.num_records,
+            'percent': round(100 * completed / self.num_records, 1) if self.num_records else 100.0,
+            'elapsed': round(elapsed, 2),
+        }
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'method': self.method,
+            'json_type': self.json_type,
+            'progress': self.progress(),
+            'error': self.error,
+        }
+
+
+class JobManager:
+
+    def __init__(self, concurrency=None):
+        self.concurrency = dict(METHOD_CONCURRENCY if concurrency is None else concurrency)
+        self._executors = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _executor(self, method):
+        with self._lock:
+            if method not in self._executors:
+                limit = self.concurrency.get(method, DEFAULT_CONCURRENCY)
+                self._executors[method] = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f'job-{method}')
+            return self._executors[method]
+
+    # Queues func(job) in the pool of the method; func returns (data, time_metrics) and should
+    # append to job.results_times while it generates
+    def submit(self, method, json_type, num_records, func):
+        self.prune()
+        job = Job(method, json_type, num_records)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor(method).submit(self._run, job, func)
+        return job
+
+    def _run(self, job, func):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result, job.time_metrics = func(job)
+            job.status = 'finished'
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def prune(self):
+        # Drop finished jobs whose results have been kept for JOB_TTL seconds
+        now = time.time()
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.done and now - job.finished_at > JOB_TTL]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=False):
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
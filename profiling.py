@@ -0,0 +1,62 @@
+# Description: Opt-in instrumentation of the generation hot paths. A Profile collects the cumulative
+# time and the number of calls per attribute (every field generator of a schema is wrapped) and
+# per phase (e.g. model load, tokenize, generate, regex extract and JSON parse of the LLM path),
+# measured with time.perf_counter_ns. Without a Profile nothing is wrapped, so the uninstrumented
+# path costs nothing extra.
+import time
+from contextlib import contextmanager
+
+
+class Profile:
+
+    def __init__(self):
+        # name -> [cumulative ns, calls]
+        self.fields = {}
+        self.phases = {}
+
+    def add_field(self, attribute, elapsed_ns, calls=1):
+        entry = self.fields.setdefault(attribute, [0, 0])
+        entry[0] += elapsed_ns
+        entry[1] += calls
+
+    def add_phase(self, phase, elapsed_ns, calls=1):
+        entry = self.phases.setdefault(phase, [0, 0])
+        entry[0] += elapsed_ns
+        entry[1] += calls
+
+    @contextmanager
+    def phase(self, phase):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter_ns() - start)
+
+    def instrument(self, compiled):
+        # Wraps the compiled (attribute, field) pairs of a schema so every call is timed
+        return [(attribute, self._timed_field(attribute, field)) for attribute, field in compiled]
+
+    def _timed_field(self, attribute, field):
+        def timed(context):
+            start = time.perf_counter_ns()
+            value = field(context)
+            self.add_field(attribute, time.perf_counter_ns() - start)
+            return value
+        return timed
+
+    def to_dict(self):
+        # Milliseconds and calls per attribute and per phase, for the time metrics
+        return {
+            'fields': {name: {'total_ms': elapsed / 1e6, 'calls': calls} for name, (elapsed, calls) in self.fields.items()},
+            'phases': {name: {'total_ms': elapsed / 1e6, 'calls': calls} for name, (elapsed, calls) in self.phases.items()},
+        }
+
+
+@contextmanager
+def phase(profile, name):
+    # Times a block into the profile, or does nothing without one
+    if profile is None:
+        yield
+    else:
+        with profile.phase(name):
+            yield
@@ -0,0 +1,200 @@
+# Description: Per-session storage for the generated results, time metrics and visualizations,
+# replacing the module-level globals so the app can serve concurrent users with a threaded or
+# multi-worker server. Entries expire after a TTL and the oldest entries are evicted once the
+# store exceeds its entry or size limit. The disk backend keeps the entries as pickle files
+# (by default in the flask_session directory), so all workers on one machine share them.
+# The generated data itself is written to one JSON file per result id (ResultFiles); the store
+# only keeps its id, metrics and a preview, and downloads are served from the file.
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import serializer
+
+# Seconds an entry is kept after it was last written
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_session')
+
+# Directory of the generated JSON files and the number of records shown on the results page
+RESULTS_DIRECTORY = os.path.join(tempfile.gettempdir(), 'json_generator_results')
+PREVIEW_RECORDS = 20
+
+_RESULT_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class MemoryResultStore:
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, size, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, size, value)
+            self._size += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+    def _evict(self):
+        now = time.time()
+        for key in [key for key, (expires_at, _, _) in self._entries.items() if expires_at < now]:
+            self._remove(key)
+        # Least recently used first, but never the entry that was just written
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+
+class DiskResultStore:
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, 'result_' + hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                self.delete(key)
+                return default
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def set(self, key, value):
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.startswith('result_') or name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_mtime + self.ttl < now and path != keep:
+                self._remove_file(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Oldest entries first, but never the entry that was just written
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if len(entries) <= self.max_entries and total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove_file(path)
+            entries = [entry for entry in entries if entry[2] != path]
+            total_size -= size
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ResultFiles:
+
+    def __init__(self, directory=RESULTS_DIRECTORY, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, data):
+        # Writes the records as an indented JSON array and returns the new result id
+        result_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, result_id + '.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            serializer.dump(data, f, pretty=True)
+        os.replace(tmp_path, path)
+        self._cleanup()
+        return result_id
+
+    def path(self, result_id):
+        # Path of the JSON file of a result, None for unknown or malformed ids
+        if not result_id or not _RESULT_ID.fullmatch(result_id):
+            return None
+        path = os.path.join(self.directory, result_id + '.json')
+        return path if os.path.exists(path) else None
+
+    def _cleanup(self):
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) + self.ttl < now:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def preview(data, max_records=PREVIEW_RECORDS):
+    return serializer.dumps(data[:max_records], pretty=True).decode('utf-8')
+
+
+def create_store(backend='memory', **options):
+    if backend == 'memory':
+        return MemoryResultStore(**options)
+    if backend == 'disk':
+        return DiskResultStore(**options)
+    raise ValueError(f"Invalid result store backend: {backend}")
@@ -0,0 +1,148 @@
+# Description: Persistent store of every generation run for benchmarking. Each run is one row of an
+# SQLite database with its method, JSON type, attributes, record count, time metrics and the
+# environment it ran in. Runs with the same method, type, attributes and record count form one
+# configuration: across its runs the store computes throughput percentiles and flags a run as a
+# regression when its throughput falls clearly below the median of the runs before it.
+import hashlib
+import os
+import platform
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import serializer
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runs.sqlite')
+
+# Percentiles reported for the throughput of a configuration and the per-record latency of a run
+PERCENTILES = (50, 90, 99)
+
+# A run is a regression when its throughput is this much below the median of the previous
+# BASELINE_RUNS runs of its configuration
+REGRESSION_THRESHOLD = 0.2
+BASELINE_RUNS = 5
+
+_COLUMNS = ['id', 'created', 'method', 'json_type', 'attributes', 'config', 'num_records', 'generation_time', 'records_per_second', 'valid_rate', 'time_metrics', 'environment']
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'hostname': platform.node(),
+        'serializer': serializer.BACKEND,
+    }
+
+
+def config_key(method, json_type, attributes, num_records):
+    # Runs of the same method, type, attribute selection and size are compared with each other
+    content = '|'.join([method, json_type, ','.join(sorted(attributes)), str(num_records)])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+
+
+def latency_percentiles(time_metrics, percentiles=PERCENTILES):
+    # Seconds between two consecutive records, from the per-record timestamps of the run
+    results_times = time_metrics.get('results_times') or []
+    if len(results_times) < 2:
+        return {f'p{p}': None for p in percentiles}
+    intervals = np.diff(np.asarray(results_times, dtype=float))
+    return {f'p{p}': float(np.percentile(intervals, p)) for p in percentiles}
+
+
+class RunStore:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        # Several workers append to the same database
+        self._db.execute("PRAGMA journal_mode = WAL")
+        with self._lock, self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS runs (
+                id TEXT PRIMARY KEY, created REAL, method TEXT, json_type TEXT, attributes TEXT,
+                config TEXT, num_records INTEGER, generation_time REAL, records_per_second REAL,
+                valid_rate REAL, time_metrics TEXT, environment TEXT)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS runs_config ON runs (config, created)")
+
+    def record(self, run_id, method, json_type, attributes, num_records, time_metrics, run_environment=None):
+        generation_time = time_metrics.get('generation_time') or 0
+        validity = time_metrics.get('result_validity')
+        row = {
+            'id': run_id,
+            'created': time.time(),
+            'method': method,
+            'json_type': json_type,
+            'attributes': serializer.dumps(list(attributes)).decode(),
+            'config': config_key(method, json_type, attributes, num_records),
+            'num_records': num_records,
+            'generation_time': generation_time,
+            'records_per_second': num_records / generation_time if generation_time > 0 else None,
+            # Share of the samples that yielded a valid record, only known for the LLM path
+            'valid_rate': validity.count(True) / len(validity) if validity else None,
+            'time_metrics': serializer.dumps(time_metrics).decode(),
+            'environment': serializer.dumps(run_environment or environment()).decode(),
+        }
+        with self._lock, self._db:
+            self._db.execute(f"INSERT OR REPLACE INTO runs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", [row[column] for column in _COLUMNS])
+        return self._to_dict(row)
+
+    def _to_dict(self, row):
+        run = dict(row)
+        for column in ('attributes', 'time_metrics', 'environment'):
+            run[column] = serializer.loads(run[column])
+        run['created_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['created']))
+        run['latency'] = latency_percentiles(run['time_metrics'])
+        return run
+
+    def get(self, run_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def list_runs(self, method=None, json_type=None, config=None, limit=100):
+        # Newest runs first
+        conditions = [(column, value) for column, value in (('method', method), ('json_type', json_type), ('config', config)) if value is not None]
+        where = ' AND '.join(f"{column} = ?" for column, _ in conditions)
+        query = f"SELECT * FROM runs {'WHERE ' + where if where else ''} ORDER BY created DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(query, [value for _, value in conditions] + [limit]).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _throughputs(self, config):
+        with self._lock:
+            rows = self._db.execute("SELECT id, records_per_second FROM runs WHERE config = ? AND records_per_second IS NOT NULL ORDER BY created", (config,)).fetchall()
+        return [(row['id'], row['records_per_second']) for row in rows]
+
+    def summary(self, config, percentiles=PERCENTILES):
+        # Throughput percentiles across the runs of a configuration
+        throughputs = [value for _, value in self._throughputs(config)]
+        summary = {'config': config, 'runs': len(throughputs)}
+        for p in percentiles:
+            summary[f'p{p}'] = float(np.percentile(throughputs, p)) if throughputs else None
+        return summary
+
+    def regressions(self, config, threshold=REGRESSION_THRESHOLD, baseline_runs=BASELINE_RUNS):
+        # Every run of the configuration compared with the median throughput of the runs before it
+        throughputs = self._throughputs(config)
+        results = {}
+        for idx, (run_id, value) in enumerate(throughputs):
+            baseline = [previous for _, previous in throughputs[max(0, idx - baseline_runs):idx]]
+            if not baseline:
+                results[run_id] = {'baseline': None, 'change': None, 'regression': False}
+                continue
+            median = float(np.median(baseline))
+            change = value / median - 1 if median > 0 else None
+            results[run_id] = {'baseline': median, 'change': change, 'regression': change is not None and change < -threshold}
+        return results
+
+    def delete(self, run_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,58 @@
+# Description: JSON serialization for the generated data. Uses orjson or ujson when installed and
+# the standard library otherwise; every backend encodes straight to UTF-8 bytes with non-ASCII
+# characters kept as they are. pretty=True indents by two spaces (the only indentation orjson
+# supports), pretty=False writes without any whitespace.
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _json_dumps(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _orjson_dumps(obj, pretty=False):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+def _ujson_dumps(obj, pretty=False):
+    return ujson.dumps(obj, indent=2 if pretty else 0, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+
+# (dumps, loads) per backend name, in order of preference
+BACKENDS = {}
+if orjson is not None:
+    BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+if ujson is not None:
+    BACKENDS['ujson'] = (_ujson_dumps, ujson.loads)
+BACKENDS['json'] = (_json_dumps, json.loads)
+
+# JSON_SERIALIZER=json forces the standard library, e.g. to compare the backends
+BACKEND = os.environ.get('JSON_SERIALIZER', next(iter(BACKENDS)))
+if BACKEND not in BACKENDS:
+    raise ValueError(f"JSON serializer {BACKEND} is not installed, available: {', '.join(BACKENDS)}")
+
+
+def dumps(obj, pretty=False, backend=None):
+    return BACKENDS[backend or BACKEND][0](obj, pretty)
+
+
+# Parses str or bytes; invalid JSON raises a ValueError (json.JSONDecodeError for json and orjson)
+def loads(data, backend=None):
+    return BACKENDS[backend or BACKEND][1](data)
+
+
+def dump(obj, f, pretty=False, backend=None):
+    # f is a file opened in binary mode
+    f.write(dumps(obj, pretty, backend))
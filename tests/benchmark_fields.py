@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generate_libraries import gen_libs_master, schema
+
+
+# Function to measure the time per value of one field generator
+def measure(json_schema, field, num_records):
+    context = json_schema.new_context()
+    start_time = time.perf_counter_ns()
+    for _ in range(num_records):
+        field(dict(context))
+    return (time.perf_counter_ns() - start_time) / num_records
+
+
+parser = argparse.ArgumentParser(description="Measure the per-value cost of every declared field of the registered schemas")
+parser.add_argument('--records', type=int, default=10000)
+parser.add_argument('--types', nargs='+', default=sorted(schema.REGISTRY))
+args = parser.parse_args()
+
+print(f"{'type':<14} {'attribute':<18} {'ns/value':>10}")
+for json_type in args.types:
+    json_schema = schema.get_schema(json_type)
+    for attribute, field in json_schema.compile(json_schema.fields):
+        print(f"{json_type:<14} {attribute:<18} {measure(json_schema, field, args.records):>10.0f}")
+
+    # The whole record, as generated for a request with all declared attributes
+    start_time = time.perf_counter_ns()
+    gen_libs_master.generate_data(json_type, list(json_schema.fields), None, args.records)
+    elapsed = time.perf_counter_ns() - start_time
+    print(f"{json_type:<14} {'(record)':<18} {elapsed / args.records:>10.0f}")
@@ -0,0 +1,48 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# The project root, where app.py is imported from
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules a libraries-only worker must not import at startup
+HEAVY_MODULES = ['torch', 'transformers', 'datasets', 'matplotlib', 'markovify']
+
+
+# Function to import a module in a fresh interpreter with -X importtime; returns the cumulative
+# microseconds per imported module and the heavy modules that ended up imported
+def measure(module):
+    code = f"import sys; import {module}; print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, result.stdout.split()
+
+
+parser = argparse.ArgumentParser(description="Measure the import time of the app with python -X importtime")
+parser.add_argument('--modules', nargs='+', default=['app'])
+parser.add_argument('--top', type=int, default=10)
+parser.add_argument('--max-seconds', type=float, default=1.0, help="Fail when a module takes longer to import")
+args = parser.parse_args()
+
+failed = False
+for module in args.modules:
+    cumulative, heavy = measure(module)
+    total = cumulative.get(module, 0) / 1e6
+    print(f"{module}: {total:.3f} s, heavy modules imported: {', '.join(heavy) or 'none'}")
+    for name, cumulative_us in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1e3:>10.1f} ms  {name}")
+    if total > args.max_seconds or (module == 'app' and heavy):
+        failed = True
+
+sys.exit(1 if failed else 0)
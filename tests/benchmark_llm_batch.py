@@ -0,0 +1,27 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import generate_llm.gen_llm as gen_llm
+from generate_llm import model_registry
+
+parser = argparse.ArgumentParser(description="Measure LLM persons throughput for different batch sizes")
+parser.add_argument('--records', type=int, default=64)
+parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+args = parser.parse_args()
+
+# Load the model up front so the measurements only contain inference
+model_registry.warm_up([model_registry.PERSONS_MODEL])
+
+print(f"{'batch':>6} {'seconds':>9} {'rec/s':>8} {'valid rec/s':>12} {'valid rate':>11}")
+for batch_size in args.batch_sizes:
+    start_time = time.perf_counter()
+    _, _, valid_result = gen_llm.generate_persons(None, args.records, batch_size=batch_size)
+    elapsed = time.perf_counter() - start_time
+    sampled = len(valid_result)
+    valid = valid_result.count(True)
+    print(f"{batch_size:>6} {elapsed:>9.2f} {sampled / elapsed:>8.2f} {valid / elapsed:>12.2f} {valid / sampled:>10.0%}")
@@ -0,0 +1,28 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generate_libraries import parallel
+
+attributes = ['userName', 'password', 'email', 'firstName', 'lastName', 'birthDate']
+
+parser = argparse.ArgumentParser(description="Measure how sharded persons generation scales with the number of worker processes")
+parser.add_argument('--records', type=int, default=200000)
+parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+parser.add_argument('--shard-size', type=int, default=parallel.SHARD_SIZE)
+parser.add_argument('--seed', type=int, default=42)
+args = parser.parse_args()
+
+print(f"{'workers':>8} {'seconds':>9} {'rec/s':>10} {'speedup':>9}")
+baseline = None
+for workers in range(1, args.max_workers + 1):
+    start_time = time.perf_counter()
+    data, _ = parallel.generate_data('persons', attributes, None, args.records, workers=workers, seed=args.seed, shard_size=args.shard_size)
+    elapsed = time.perf_counter() - start_time
+    assert len(data) == args.records
+    baseline = baseline or elapsed
+    print(f"{workers:>8} {elapsed:>9.2f} {args.records / elapsed:>10.0f} {baseline / elapsed:>8.1f}x")
@@ -0,0 +1,31 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from generate_libraries import generate_persons
+
+attributes = ['userName', 'password', 'email', 'firstName', 'lastName', 'birthDate']
+
+
+# Function to measure records/sec of one generation path
+def measure(generate, num_records):
+    start_time = time.perf_counter()
+    data, _ = generate(attributes, num_records)
+    elapsed = time.perf_counter() - start_time
+    assert len(data) == num_records
+    return num_records / elapsed if elapsed > 0 else float('inf')
+
+
+parser = argparse.ArgumentParser(description="Compare the row-wise and columnar persons generators")
+parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000])
+args = parser.parse_args()
+
+print(f"{'records':>10} {'row rec/s':>14} {'columnar rec/s':>16} {'speedup':>9}")
+for num_records in args.counts:
+    row_rate = measure(generate_persons.generate_json_data, num_records)
+    columnar_rate = measure(generate_persons.generate_columnar_data, num_records)
+    print(f"{num_records:>10} {row_rate:>14.0f} {columnar_rate:>16.0f} {columnar_rate / row_rate:>8.1f}x")
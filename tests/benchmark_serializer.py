@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import serializer
+
+DATASETS = {
+    'persons': 'person_dataset.json',
+    'activities': 'activities.json',
+}
+
+
+# The encoding /generate used before the serializer layer
+def escaped_dumps(data):
+    return json.dumps(data, indent=4).encode('utf-8').decode('unicode_escape').encode('utf-8')
+
+
+def load_records(json_type, num_records):
+    # Repeats the records of the dataset up to num_records
+    with open(os.path.join(os.path.dirname(__file__), '..', 'generate_llm', DATASETS[json_type]), 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    return [records[idx % len(records)] for idx in range(num_records)]
+
+
+# Function to measure MB/s and records/sec of one encoder
+def measure(encode, data):
+    start_time = time.perf_counter()
+    encoded = encode(data)
+    elapsed = time.perf_counter() - start_time
+    return len(encoded) / elapsed / 1e6, len(data) / elapsed
+
+
+parser = argparse.ArgumentParser(description="Compare the JSON serializer backends on repeated dataset records")
+parser.add_argument('--counts', type=int, nargs='+', default=[10000, 100000, 1000000])
+parser.add_argument('--types', nargs='+', default=list(DATASETS), choices=list(DATASETS))
+args = parser.parse_args()
+
+encoders = {'json indent=4 + unicode_escape': escaped_dumps}
+for backend in serializer.BACKENDS:
+    encoders[f'{backend} compact'] = lambda data, backend=backend: serializer.dumps(data, backend=backend)
+    encoders[f'{backend} pretty'] = lambda data, backend=backend: serializer.dumps(data, pretty=True, backend=backend)
+
+print(f"{'type':>10} {'records':>9} {'encoder':>32} {'MB/s':>9} {'rec/s':>12}")
+for json_type in args.types:
+    for num_records in args.counts:
+        data = load_records(json_type, num_records)
+        for name, encode in encoders.items():
+            mb_per_sec, records_per_sec = measure(encode, data)
+            print(f"{json_type:>10} {num_records:>9} {name:>32} {mb_per_sec:>9.1f} {records_per_sec:>12.0f}")
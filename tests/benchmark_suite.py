@@ -0,0 +1,141 @@
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+# Make the project root importable when running this script directly
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import run_store
+import serializer
+# Importing gen_libs_master registers the schemas of all types
+from generate_libraries import gen_libs_master
+
+LIBRARIES = 'Python Libraries'
+LLM = 'Large Language Model'
+
+# Records generated before the measurement, so the Faker pools and the model are built
+WARMUP_RECORDS = 10
+
+
+def generate(method, json_type, attributes, num_records):
+    # Returns the records and their validity (None when the method does not report it)
+    if method == LLM:
+        from generate_llm import gen_llm
+        data, _, validity = gen_llm.generate_data(json_type, None, num_records)
+        return data, validity
+    data, _ = gen_libs_master.generate_data(json_type, attributes, None, num_records)
+    return data, None
+
+
+def valid_rate(data, validity, attributes, num_records):
+    if validity is not None:
+        return validity.count(True) / len(validity) if validity else 0.0
+    # Library records are valid when they carry every requested attribute
+    return sum(1 for record in data if all(attribute in record for attribute in attributes)) / num_records
+
+
+# Function to run one case in its own process, so the peak RSS belongs to this case only
+def run_case(method, json_type, attributes, num_records, seed):
+    import numpy as np
+    from faker import Faker
+    from generate_libraries.faker_pool import faker_pool
+
+    random.seed(seed)
+    np.random.seed(seed)
+    Faker.seed(seed)
+    faker_pool.reseed(seed)
+    generate(method, json_type, attributes, min(WARMUP_RECORDS, num_records))
+
+    start_time = time.perf_counter()
+    data, validity = generate(method, json_type, attributes, num_records)
+    elapsed = time.perf_counter() - start_time
+    rate = valid_rate(data, validity, attributes, num_records)
+    # Read before the traced run, so the tracing overhead is not part of the peak
+    peak_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    del data
+
+    # A second, traced run for the allocations: the traced peak and the memory blocks still held
+    # by the generated records, per record. Tensors allocated by torch are not traced.
+    tracemalloc.start()
+    traced_data, _ = generate(method, json_type, attributes, num_records)
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced_data
+
+    return {
+        'method': method,
+        'json_type': json_type,
+        'num_records': num_records,
+        'seed': seed,
+        'seconds': elapsed,
+        'records_per_second': num_records / elapsed if elapsed > 0 else None,
+        'valid_rate': rate,
+        'peak_rss_bytes': peak_rss_bytes,
+        'alloc_peak_bytes_per_record': peak_bytes / num_records,
+        'alloc_blocks_per_record': blocks / num_records,
+    }
+
+
+def case_key(case):
+    return f"{case['method']}|{case['json_type']}|{case['num_records']}|{case['seed']}"
+
+
+# Function to compare the throughput of every case with the same case of a previous result file
+def compare(cases, baseline_path, threshold):
+    with open(baseline_path, 'rb') as f:
+        baseline = {case_key(case): case for case in serializer.loads(f.read())['cases']}
+    regressions = []
+    for case in cases:
+        previous = baseline.get(case_key(case))
+        if previous is None or not previous['records_per_second'] or not case['records_per_second']:
+            continue
+        case['change'] = case['records_per_second'] / previous['records_per_second'] - 1
+        if case['change'] < -threshold:
+            regressions.append(case)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless throughput, memory and validity benchmark of all generators")
+    parser.add_argument('--types', nargs='+', default=None, help="JSON types of the Python Libraries method, all registered types by default")
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--llm', action='store_true', help="Also benchmark the LLM path (persons)")
+    parser.add_argument('--llm-counts', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with the JSON results of a previous run and fail on regressions")
+    parser.add_argument('--threshold', type=float, default=run_store.REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    cases = []
+    for json_type in args.types or sorted(gen_libs_master.schema.REGISTRY):
+        attributes = list(gen_libs_master.schema.get_schema(json_type).fields)
+        cases.extend((LIBRARIES, json_type, attributes, num_records, seed) for num_records in args.counts for seed in args.seeds)
+    if args.llm:
+        cases.extend((LLM, 'persons', ['userName', 'password', 'email', 'firstName', 'lastName', 'birthDate'], num_records, seed) for num_records in args.llm_counts for seed in args.seeds)
+
+    # A fresh process per case, so neither the peak RSS nor warm caches leak between cases
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"{'method':<22} {'type':<14} {'records':>8} {'seed':>5} {'rec/s':>12} {'valid':>6} {'peak RSS MB':>12} {'B/rec':>9} {'blocks/rec':>11}")
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, case)
+        results.append(result)
+        print(f"{result['method']:<22} {result['json_type']:<14} {result['num_records']:>8} {result['seed']:>5} {result['records_per_second']:>12.0f} {result['valid_rate']:>6.2f} {result['peak_rss_bytes'] / 2 ** 20:>12.1f} {result['alloc_peak_bytes_per_record']:>9.0f} {result['alloc_blocks_per_record']:>11.1f}")
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else []
+    for case in regressions:
+        print(f"Regression: {case_key(case)} {case['change']:+.0%} records/sec")
+
+    if args.output:
+        with open(args.output, 'wb') as f:
+            serializer.dump({'created': time.time(), 'environment': run_store.environment(), 'cases': results}, f, pretty=True)
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the project root importable for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,64 @@
+from generate_libraries.faker_pool import FakerPool
+
+# One ASCII and one non-ASCII locale, so every value shows the locale block it came from
+LOCALES = ['en_US', 'ja_JP']
+
+
+def is_ascii_block(values):
+    return all(value.isascii() for value in values)
+
+
+def test_initial_size():
+    # Without a refresh interval no background thread runs, grow and refresh are called directly
+    pool = FakerPool(LOCALES, pool_size=50, refresh_interval=0, initial_pool_size=10)
+    assert len(pool.pool('first_name', 5)) == 20
+    assert len(pool.pool('last_name', 60)) == 60
+    assert len(pool.pool('word', 1000)) == 100
+
+
+def test_grow():
+    pool = FakerPool(LOCALES, pool_size=50, refresh_interval=0, initial_pool_size=10)
+    small = pool.pool('first_name', 5)
+    pool.grow()
+    grown = pool.pool('first_name')
+    assert len(grown) == 100 and len(small) == 20
+    # The values built first stay at the start of their locale's block
+    assert list(grown[:10]) == list(small[:10])
+    assert list(grown[50:60]) == list(small[10:])
+    assert is_ascii_block(grown[:50]) and not any(value.isascii() for value in grown[50:])
+    # Full pools are left as they are
+    pool.grow()
+    assert pool.pool('first_name') is grown
+
+
+def test_refresh_copy_on_write():
+    pool = FakerPool(LOCALES, pool_size=100, refresh_interval=0, refresh_fraction=0.5)
+    before = pool.pool('first_name', 200)
+    snapshot = before.copy()
+    pool.refresh()
+    after = pool.pool('first_name')
+    # The array handed out earlier is never written to
+    assert list(before) == list(snapshot)
+    assert after is not before and list(after) != list(snapshot)
+    # Refreshed values stay in their locale's block
+    assert is_ascii_block(after[:100]) and not any(value.isascii() for value in after[100:])
+
+
+def test_reseed():
+    pool = FakerPool(LOCALES, pool_size=50, refresh_interval=0.01, initial_pool_size=10)
+    pool.pool('word', 5)
+    refresher = pool._refresher
+    assert refresher.is_alive()
+
+    pool.reseed(7)
+    refresher.join(1)
+    assert not refresher.is_alive()
+    # Seeded pools are built at full size and do not start the refresher again
+    first = pool.pool('word', 5)
+    assert len(first) == 100
+    assert pool._refresher is refresher
+
+    pool.reseed(7)
+    assert list(pool.pool('word')) == list(first)
+    pool.reseed(8)
+    assert list(pool.pool('word')) != list(first)
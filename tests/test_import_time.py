@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+# The project root, where app.py is imported from
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules the app must not import at startup, see app.GENERATION_BACKENDS
+HEAVY_MODULES = ['torch', 'transformers', 'markovify']
+
+# Seconds the import of app may take, the --max-seconds default of benchmark_import_time.py
+IMPORT_BUDGET_SECONDS = 1.0
+
+
+def test_import_app():
+    code = f"import sys; import app; print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    with tempfile.TemporaryDirectory() as directory:
+        # No run store and no result files are written by the import
+        env = dict(os.environ, RUN_STORE_PATH='', RESULTS_DIRECTORY=directory)
+        env.pop('WARMUP_MODELS', None)
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    # import time: self [us] | cumulative | imported package
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'imported package' not in line:
+            _, cumulative_us, name = line[len('import time:'):].split('|')
+            cumulative[name.strip()] = int(cumulative_us)
+
+    assert result.stdout.split() == [], f"app imported {result.stdout.strip()}"
+    assert cumulative['app'] / 1e6 < IMPORT_BUDGET_SECONDS, f"importing app took {cumulative['app'] / 1e6:.3f} s"
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import jobs
+from generate_libraries import gen_libs_master
+
+
+def wait_done(job, timeout=10):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.done, job.status
+
+
+def test_progress():
+    manager = jobs.JobManager({'test': 1})
+    reached = threading.Event()
+    release = threading.Event()
+
+    def run(job):
+        job.results_times.extend([time.time()] * 3)
+        reached.set()
+        release.wait(10)
+        return 'result-id', {'generation_time': 1.0}
+
+    job = manager.submit('test', 'persons', 10, run)
+    # With a concurrency of 1 a second job waits for the first one
+    queued = manager.submit('test', 'persons', 5, lambda job: (None, None))
+    assert reached.wait(10)
+    assert job.status == 'running' and queued.status == 'queued'
+    progress = job.progress()
+    assert (progress['completed'], progress['total'], progress['percent']) == (3, 10, 30.0)
+
+    release.set()
+    wait_done(job)
+    wait_done(queued)
+    assert job.status == 'finished' and job.result == 'result-id'
+    assert job.to_dict()['progress']['completed'] == 10
+    assert manager.get(job.id) is job
+    manager.shutdown(wait=True)
+
+
+def test_generator_progress():
+    # The generators append one timestamp per record to the job's results_times
+    manager = jobs.JobManager()
+
+    def run(job):
+        data, _ = gen_libs_master.generate_data('goals', ['type'], None, 25, results_times=job.results_times)
+        return len(data), None
+
+    job = manager.submit('Python Libraries', 'goals', 25, run)
+    wait_done(job)
+    assert job.result == 25 and len(job.results_times) == 25
+    manager.shutdown(wait=True)
+
+
+def test_failed():
+    manager = jobs.JobManager()
+
+    def run(job):
+        job.results_times.append(time.time())
+        raise ValueError("Invalid JSON type: unknown")
+
+    job = manager.submit('Python Libraries', 'unknown', 4, run)
+    wait_done(job)
+    assert job.status == 'failed' and job.error == "Invalid JSON type: unknown"
+    assert job.progress()['completed'] == 1
+    manager.shutdown(wait=True)
+
+
+def test_prune(monkeypatch):
+    manager = jobs.JobManager()
+    job = manager.submit('Python Libraries', 'goals', 1, lambda job: (None, None))
+    wait_done(job)
+    manager.prune()
+    assert manager.get(job.id) is job
+    monkeypatch.setattr(jobs, 'JOB_TTL', 0)
+    job.finished_at -= 1
+    manager.prune()
+    assert manager.get(job.id) is None
+    manager.shutdown(wait=True)
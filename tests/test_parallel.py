@@ -0,0 +1,21 @@
+import io
+import json
+
+from generate_libraries import parallel, upload_parser
+
+UPLOAD = [{'badgeName': f'Badge {idx} Gold', 'badgeDescription': f'Awarded for finishing course number {idx} of the program'} for idx in range(200)]
+
+
+def test_upload():
+    # A parsed upload, with its Markov models, is sent to the worker processes
+    uploaded_data = upload_parser.parse_upload(io.BytesIO(json.dumps(UPLOAD).encode()))
+    data, results_times = parallel.generate_data('badges', list(uploaded_data.attributes), uploaded_data, 30, workers=2, shard_size=10)
+    assert len(data) == 30 and len(results_times) == 30
+    assert all(set(record) == {'badgeName', 'badgeDescription'} for record in data)
+
+
+def test_seeded_upload():
+    uploaded_data = upload_parser.parse_upload(io.BytesIO(json.dumps(UPLOAD).encode()))
+    first, _ = parallel.generate_data('badges', list(uploaded_data.attributes), uploaded_data, 20, workers=1, seed=7, shard_size=10)
+    second, _ = parallel.generate_data('badges', list(uploaded_data.attributes), uploaded_data, 20, workers=2, seed=7, shard_size=10)
+    assert first == second
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import time
+
+import result_store
+import serializer
+
+
+def test_memory_ttl():
+    store = result_store.MemoryResultStore(ttl=0.05)
+    store.set('a', {'num_generated': 1})
+    assert store.get('a') == {'num_generated': 1}
+    time.sleep(0.1)
+    assert store.get('a') is None
+    assert store.get('a', {}) == {}
+
+
+def test_memory_eviction():
+    store = result_store.MemoryResultStore(max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    # Reading a makes b the least recently used entry
+    assert store.get('a') == 1
+    store.set('c', 3)
+    assert store.get('b') is None
+    assert store.get('a') == 1 and store.get('c') == 3
+
+
+def test_memory_size_limit():
+    store = result_store.MemoryResultStore(max_bytes=3000)
+    store.set('a', 'x' * 1000)
+    store.set('b', 'x' * 1000)
+    store.set('c', 'x' * 1000)
+    assert store.get('a') is None and store.get('b') is not None
+    # An entry above the limit on its own is still kept, since it was just written
+    store.set('d', 'x' * 5000)
+    assert store.get('d') is not None and store.get('c') is None
+
+
+def test_disk_ttl_and_eviction():
+    with tempfile.TemporaryDirectory() as directory:
+        store = result_store.DiskResultStore(directory, max_entries=2)
+        store.set('a', {'preview': '[]'})
+        store.set('b', 2)
+        assert store.get('a') == {'preview': '[]'}
+        # The oldest entry by modification time is evicted first
+        now = time.time()
+        os.utime(store._path('a'), (now - 20, now - 20))
+        os.utime(store._path('b'), (now - 10, now - 10))
+        store.set('c', 3)
+        assert store.get('a') is None
+        assert store.get('b') == 2 and store.get('c') == 3
+
+        os.utime(store._path('b'), (now - 2 * store.ttl, now - 2 * store.ttl))
+        assert store.get('b') is None
+        assert not os.path.exists(store._path('b'))
+
+
+def test_result_files():
+    with tempfile.TemporaryDirectory() as directory:
+        files = result_store.ResultFiles(directory, ttl=60)
+        result_id = files.save([{'a': 1}])
+        with open(files.path(result_id), 'rb') as f:
+            assert serializer.loads(f.read()) == [{'a': 1}]
+        assert files.path('../' + result_id) is None
+        assert files.path('0' * 32) is None
+
+        # Expired files are removed with the next save
+        old = time.time() - 120
+        os.utime(files.path(result_id), (old, old))
+        files.save([])
+        assert files.path(result_id) is None
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+
+import run_store
+
+NUM_RECORDS = 1000
+
+ENVIRONMENT = {'python': 'test'}
+
+
+def record_runs(store, throughputs):
+    # One run per throughput in records per second, oldest first
+    for idx, records_per_second in enumerate(throughputs):
+        store.record(f'run{idx}', 'Faker', 'persons', ['userName'], NUM_RECORDS, {'generation_time': NUM_RECORDS / records_per_second}, ENVIRONMENT)
+        # Runs are ordered by their creation time
+        time.sleep(0.002)
+    return run_store.config_key('Faker', 'persons', ['userName'], NUM_RECORDS)
+
+
+def test_regressions():
+    below = 1 - run_store.REGRESSION_THRESHOLD - 0.01
+    above = 1 - run_store.REGRESSION_THRESHOLD + 0.01
+    with tempfile.TemporaryDirectory() as directory:
+        store = run_store.RunStore(os.path.join(directory, 'runs.sqlite'))
+        config = record_runs(store, [100, 100, 100, 100 * above, 100 * below])
+        regressions = store.regressions(config)
+        store.close()
+
+    assert regressions['run0'] == {'baseline': None, 'change': None, 'regression': False}
+    assert regressions['run1']['baseline'] == 100 and not regressions['run1']['regression']
+    assert not regressions['run3']['regression']
+    assert regressions['run4']['baseline'] == 100 and regressions['run4']['regression']
+
+
+def test_summary():
+    with tempfile.TemporaryDirectory() as directory:
+        store = run_store.RunStore(os.path.join(directory, 'runs.sqlite'))
+        config = record_runs(store, range(1, 101))
+        summary = store.summary(config)
+        store.close()
+
+    assert summary['runs'] == 100
+    assert abs(summary['p50'] - 50.5) < 1e-6
+    assert abs(summary['p90'] - 90.1) < 1e-6
+    assert abs(summary['p99'] - 99.01) < 1e-6
+
+
+def test_latency_percentiles():
+    # Records 0.1 s apart, with one slow record at the end
+    results_times = [0.1 * idx for idx in range(100)] + [19.9]
+    latency = run_store.latency_percentiles({'results_times': results_times})
+    assert abs(latency['p50'] - 0.1) < 1e-9
+    assert latency['p99'] > 0.1
+    assert run_store.latency_percentiles({'results_times': [0]}) == {'p50': None, 'p90': None, 'p99': None}
@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+
+import numpy as np
+
+from generate_libraries.sampling import AliasSampler
+
+WEIGHTS = {'gold': 5, 'silver': 3, 'bronze': 1.5, 'none': 0.5, 'never': 0}
+
+NUM_DRAWS = 100000
+
+
+def assert_frequencies(counts):
+    total = sum(WEIGHTS.values())
+    for value, weight in WEIGHTS.items():
+        frequency = counts[value] / NUM_DRAWS
+        assert abs(frequency - weight / total) < 0.01, (value, frequency, weight / total)
+
+
+def test_draw():
+    random.seed(1)
+    sampler = AliasSampler.from_counts(WEIGHTS)
+    assert_frequencies(Counter(sampler.draw() for _ in range(NUM_DRAWS)))
+
+
+def test_draw_vectorized():
+    np.random.seed(1)
+    sampler = AliasSampler.from_counts(WEIGHTS)
+    values = sampler.draw(NUM_DRAWS)
+    assert len(values) == NUM_DRAWS
+    assert_frequencies(Counter(values.tolist()))
+
+
+def test_invalid_weights():
+    for values, weights in [([], []), (['a', 'b'], [0, 0]), (['a', 'b'], [1, -1]), (['a', 'b'], [1])]:
+        try:
+            AliasSampler(values, weights)
+        except ValueError:
+            continue
+        raise AssertionError(f"weights {weights!r} for {values!r} were accepted")
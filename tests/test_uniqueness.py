@@ -0,0 +1,51 @@
+import os
+import random
+
+from generate_libraries import uniqueness
+
+
+def test_spill():
+    # A high error rate makes the Bloom filter report many values it has not seen, so the spill
+    # file has to reject them
+    index = uniqueness.UniqueIndex(exact_limit=10, error_rate=0.5)
+    taken = [f'user{idx}' for idx in range(50)]
+    assert all(index.add(value) for value in taken)
+    assert index.bloom is not None and not index.exact
+    spill_path = index.spill_path
+    assert os.path.exists(spill_path)
+
+    assert len(index) == 50
+    assert all(value in index for value in taken)
+    assert not any(index.add(value) for value in taken)
+    # No value is accepted twice, and no new value is rejected because of a filter positive
+    new_values = [f'other{idx}' for idx in range(1000)]
+    assert not any(value in index for value in new_values)
+    assert all(index.add(value) for value in new_values)
+    assert len(index) == 1050
+
+    index.close()
+    assert not os.path.exists(spill_path)
+
+
+def test_claim_after_spill():
+    random.seed(3)
+    unique_values = uniqueness.UniqueValues('email', index=uniqueness.UniqueIndex(exact_limit=10))
+    claimed = unique_values.claim_all(['anna@example.com'] * 30)
+    assert len(set(claimed)) == 30
+    assert claimed[0] == 'anna@example.com'
+    # The suffix goes before the domain
+    assert all(value.startswith('anna') and value.endswith('@example.com') for value in claimed)
+    unique_values.index.close()
+
+
+def test_exhausted():
+    # Every candidate of the first four retries (suffixes 1 to 100) is taken
+    index = uniqueness.UniqueIndex()
+    for value in ['anna'] + [f'anna{suffix}' for suffix in range(1, 101)]:
+        index.add(value)
+    unique_values = uniqueness.UniqueValues('userName', max_retries=4, index=index)
+    try:
+        unique_values.claim('anna')
+    except uniqueness.UniqueValueExhausted:
+        return
+    raise AssertionError("claim found a free value although all candidates were taken")
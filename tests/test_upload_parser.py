@@ -0,0 +1,121 @@
+import io
+import json
+
+from generate_libraries import upload_parser
+
+# Records with every kind of value a chunk boundary can cut: strings with escapes and raw line
+# breaks, numbers, literals and nested objects
+RECORDS = [
+    {'badgeName': f'Badge {idx}', 'badgeDescription': 'Line one\nline "two" ä \\ end', 'count': idx * 1.5, 'active': idx % 2 == 0, 'note': None, 'geo': {'lat': -idx, 'tags': ['a', 'b']}}
+    for idx in range(10)
+]
+
+
+class CountingStream(io.BytesIO):
+    # Counts the bytes read, to check that malformed input fails without reading the whole file
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def parse(data, chunk_size):
+    return list(upload_parser.iter_records(io.BytesIO(data), chunk_size))
+
+
+def assert_error(data, chunk_size=4):
+    try:
+        parse(data, chunk_size)
+    except json.JSONDecodeError:
+        return
+    raise AssertionError(f"{data!r} parsed without an error")
+
+
+def test_array():
+    data = json.dumps(RECORDS, indent=4, ensure_ascii=False).encode()
+    assert parse(data, upload_parser.CHUNK_SIZE) == RECORDS
+    assert parse(b'[]', 1) == []
+    assert parse(b' [ {"a": 1} , {"a": 2} ] ', 1) == [{'a': 1}, {'a': 2}]
+
+
+def test_ndjson():
+    data = '\n'.join(json.dumps(record, ensure_ascii=False) for record in RECORDS).encode() + b'\n'
+    assert parse(data, upload_parser.CHUNK_SIZE) == RECORDS
+    # With a byte order mark and an \u escape instead of the raw character
+    assert parse(b'\xef\xbb\xbf' + json.dumps(RECORDS[0]).encode(), 3) == [RECORDS[0]]
+
+
+def test_raw_line_breaks():
+    # Line breaks inside string values are taken as they are
+    assert parse(b'[{"a": "one\ntwo"}]', 2) == [{'a': 'one\ntwo'}]
+
+
+def test_chunk_boundaries():
+    # Every chunk size up to the length of a record, so every token is cut somewhere
+    array = json.dumps(RECORDS[:3], indent=2, ensure_ascii=False).encode()
+    ndjson = '\n'.join(json.dumps(record) for record in RECORDS[:3]).encode()
+    for chunk_size in range(1, len(json.dumps(RECORDS[0])) + 2):
+        assert parse(array, chunk_size) == RECORDS[:3], chunk_size
+        assert parse(ndjson, chunk_size) == RECORDS[:3], chunk_size
+
+
+def test_commas():
+    for data in (b'[,{"a": 1}]', b'[{"a": 1},,{"a": 2}]', b'[{"a": 1} {"a": 2}]', b'[{"a": 1},]', b'[{"a": 1},'):
+        assert_error(data)
+
+
+def test_malformed():
+    for data in (b'[1, 2]', b'{"a": ', b'[{"a": 1}', b'{"a" 1}\n', b'{"a": tru}\n'):
+        assert_error(data)
+
+
+def test_malformed_fails_early():
+    # A broken record at the start is reported after the first chunks, not at the end of the file
+    data = b'{"a": 1 "b": 2}\n' + b'{"a": 1}\n' * 100000
+    stream = CountingStream(data)
+    try:
+        list(upload_parser.iter_records(stream, 64))
+    except json.JSONDecodeError:
+        pass
+    else:
+        raise AssertionError("malformed NDJSON parsed without an error")
+    assert stream.bytes_read <= 128, stream.bytes_read
+
+
+def test_error_position():
+    # Errors past the first chunks report their line and column in the upload
+    data = b'{"a": 1}\n' * 5001 + b'{"a" 1}\n'
+    for chunk_size in (7, 64, upload_parser.CHUNK_SIZE):
+        try:
+            parse(data, chunk_size)
+        except json.JSONDecodeError as e:
+            assert (e.lineno, e.colno, e.pos) == (5002, 6, 5001 * 9 + 5), (chunk_size, e.lineno, e.colno, e.pos)
+            assert 'line 5002 column 6' in str(e)
+        else:
+            raise AssertionError("malformed NDJSON parsed without an error")
+    # Within one long line the column counts across the chunks
+    try:
+        parse(b'[' + b'{"a": 1}, ' * 100 + b'{"a": 1} {"a": 2}]', 16)
+    except json.JSONDecodeError as e:
+        assert (e.lineno, e.colno) == (1, 1011), (e.lineno, e.colno)
+    else:
+        raise AssertionError("missing comma parsed without an error")
+
+
+def test_cached_models():
+    # A second upload of the same bytes reuses the models trained for the first one
+    data = json.dumps([{'badgeName': f'Badge {idx} Gold', 'level': idx} for idx in range(50)]).encode()
+    first = upload_parser.parse_upload(io.BytesIO(data))
+    second = upload_parser.parse_upload(io.BytesIO(data))
+    assert first.digest == second.digest
+    assert second.models.corpus_models is first.models.corpus_models
+    assert second.num_records == 50 and second.attributes == ['badgeName', 'level']
+    # Streams that cannot be rewound are hashed while parsing
+    stream = CountingStream(data)
+    stream.seekable = lambda: False
+    assert upload_parser.parse_upload(stream).digest == first.digest
@@ -0,0 +1,24 @@
+import numpy as np
+
+import visualize
+
+
+def test_lttb():
+    values = np.cumsum(np.random.default_rng(0).random(5000))
+    for threshold in (3, 10, 1000):
+        indices = visualize.lttb_indices(values, threshold)
+        assert len(indices) == threshold
+        assert indices[0] == 0 and indices[-1] == len(values) - 1
+        assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_short():
+    # Series that already fit are plotted as they are
+    assert visualize.lttb_indices([0, 1, 2], 10).tolist() == [0, 1, 2]
+
+
+def test_lttb_peak():
+    # A single spike is kept even though almost all points are dropped
+    values = np.zeros(1000)
+    values[517] = 5
+    assert 517 in visualize.lttb_indices(values, 20)
@@ -1,66 +1,227 @@
-import matplotlib
-matplotlib.use('agg')
-import matplotlib.pyplot as plt
 import io
 import base64
+import html
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import serializer
+
+# Points plotted per series, longer results_times series are downsampled with LTTB
+MAX_PLOT_POINTS = 1000
+
+# Rendered charts kept per process, keyed by the run id (the result id of the run)
+MAX_CACHED_CHARTS = 64
+
+_chart_cache = OrderedDict()
+_chart_lock = threading.Lock()
+
+
+# Largest-Triangle-Three-Buckets: picks max_points indices of the series that keep its visual shape.
+# The first and last points are always kept, every bucket in between contributes the point that
+# spans the largest triangle with the point picked before and the average of the next bucket.
+def lttb_indices(values, max_points=MAX_PLOT_POINTS):
+    num_values = len(values)
+    if max_points >= num_values or max_points < 3:
+        return np.arange(num_values)
+
+    y = np.asarray(values, dtype=float)
+    x = np.arange(num_values, dtype=float)
+    edges = np.linspace(1, num_values - 1, max_points - 1).astype(int)
+    indices = [0]
+
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else num_values
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        prev = indices[-1]
+        areas = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        indices.append(start + int(areas.argmax()))
+
+    indices.append(num_values - 1)
+    return np.array(indices)
+
+
+# The data of one chart: the (downsampled) per-record times with their validity and the reference
+# lines, also served as JSON for client-side rendering
+def chart_series(metrics, method, json_type, max_points=MAX_PLOT_POINTS):
+    results_times = metrics.get('results_times') or [0]
+    indices = lttb_indices(results_times, max_points)
+    # results_times starts with 0, so entry idx + 1 belongs to record idx
+    validity = metrics.get('result_validity') or []
+    return {
+        'method': method,
+        'json_type': json_type,
+        'num_points': len(results_times),
+        'x': indices.tolist(),
+        'y': [results_times[idx] for idx in indices],
+        'valid': [validity[idx - 1] if 0 < idx <= len(validity) else None for idx in indices],
+        'generation_time': metrics.get('generation_time'),
+        'avg_time_per_record': metrics.get('avg_time_per_record'),
+        'model_load_time': metrics.get('model_load_time'),
+        'inference_time': metrics.get('inference_time'),
+        'profile': metrics.get('profile'),
+    }
+
+
+def render_png(fig):
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return base64.b64encode(img.getvalue()).decode()
+
 
 def plot_metrics(metrics, title_prefix, method, json_type):
-    plt.figure(figsize=(7, 5))
-    
+    # A Figure of its own instead of the pyplot state machine, so concurrent requests do not draw
+    # into each other's charts; matplotlib is imported with the first chart
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import MaxNLocator
+
+    fig = Figure(figsize=(7, 5))
+    ax = fig.add_subplot()
+    series = chart_series(metrics, method, json_type)
+
     if method != 'Python Libraries':
-        x_data = range(0, len(metrics['results_times']))
-        plt.plot(x_data, metrics['results_times'], linestyle='-', color='grey')
-        
-        valid_indices = [idx + 1 for idx, valid in enumerate(metrics.get('result_validity', [])) if valid]
-        invalid_indices = [idx + 1 for idx, valid in enumerate(metrics.get('result_validity', [])) if not valid]
-
-        if valid_indices:
-            plt.scatter(valid_indices, [metrics['results_times'][idx] for idx in valid_indices], marker='o', s=50, color='g', label='Valid Result')
-        if invalid_indices:
-            plt.scatter(invalid_indices, [metrics['results_times'][idx] for idx in invalid_indices], marker='o', s=50, color='r', label='Invalid Result')
-        
-        if metrics['result_validity'].count(True) > 1:
-            plt.axhline(y=metrics['avg_time_per_record'], color='m', linestyle='--', label=f'Avg Time per (valid) Result ({metrics["avg_time_per_record"]:.2f} s)')
-
-    plt.axhline(y=metrics['generation_time'], color='m', linestyle='-', label=f'Generation Time ({metrics["generation_time"]:.4f} s)')
-    
-    if method == 'Python Libraries' and len(metrics['results_times']) > 2:
-        plt.axhline(y=metrics['avg_time_per_record'], color='m', linestyle='--', label=f'Saved Avg Time per (valid) Result ({metrics["avg_time_per_record"]:.4f} s)')
-
-    max_y = max(max(metrics.get('results_times', [0])), metrics.get('generation_time', 0), metrics.get('avg_time_per_record', 0))
-    plt.ylim(0, max_y * 1.1)
-    
-    plt.xticks(range(1, len(metrics['results_times'])))
-    plt.xlabel('Entry')
-    plt.ylabel('Time (s)')
-    plt.title(f'{title_prefix} for {json_type} with {method}')
-    plt.legend()
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png')
-    img.seek(0)
-    plot_base64 = base64.b64encode(img.getvalue()).decode()
-    
-    plt.clf()
-    
-    return plot_base64
-
-def visualize_data(time_metrics, saved_json_data, cur_method, json_type):
-    plot_base64_list = []
+        ax.plot(series['x'], series['y'], linestyle='-', color='grey')
+
+        valid_points = [(x, y) for x, y, valid in zip(series['x'], series['y'], series['valid']) if valid]
+        invalid_points = [(x, y) for x, y, valid in zip(series['x'], series['y'], series['valid']) if valid is False]
+
+        if valid_points:
+            ax.scatter(*zip(*valid_points), marker='o', s=50, color='g', label='Valid Result')
+        if invalid_points:
+            ax.scatter(*zip(*invalid_points), marker='o', s=50, color='r', label='Invalid Result')
+
+        if (metrics.get('result_validity') or []).count(True) > 1:
+            ax.axhline(y=metrics['avg_time_per_record'], color='m', linestyle='--', label=f'Avg Time per (valid) Result ({metrics["avg_time_per_record"]:.2f} s)')
+
+        # Model load versus inference time, the load time is 0 when the model was already warm
+        if metrics.get('model_load_time') is not None:
+            ax.axhline(y=metrics['model_load_time'], color='c', linestyle=':', label=f'Model Load Time ({metrics["model_load_time"]:.2f} s)')
+        if metrics.get('inference_time') is not None:
+            ax.axhline(y=metrics['inference_time'], color='b', linestyle=':', label=f'Inference Time ({metrics["inference_time"]:.2f} s)')
+
+    ax.axhline(y=metrics['generation_time'], color='m', linestyle='-', label=f'Generation Time ({metrics["generation_time"]:.4f} s)')
+
+    if method == 'Python Libraries' and series['num_points'] > 2:
+        ax.axhline(y=metrics['avg_time_per_record'], color='m', linestyle='--', label=f'Saved Avg Time per (valid) Result ({metrics["avg_time_per_record"]:.4f} s)')
+
+    max_y = max(max(series['y']), metrics.get('generation_time', 0), metrics.get('avg_time_per_record', 0))
+    ax.set_ylim(0, max_y * 1.1 or 1)
+
+    # A bounded number of integer ticks instead of one tick per record
+    ax.set_xlim(0, max(series['num_points'] - 1, 1))
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_xlabel('Entry')
+    ax.set_ylabel('Time (s)')
+    ax.set_title(f'{title_prefix} for {json_type} with {method}')
+    ax.legend()
+
+    return render_png(fig)
+
+# Horizontal bars of the cumulative time per attribute and per phase of a profiled run, None when
+# nothing was timed
+def plot_breakdown(profile, title_prefix, method, json_type):
+    from matplotlib.figure import Figure
+
+    sections = [(name, entries) for name, entries in (('Attributes', profile.get('fields')), ('Phases', profile.get('phases'))) if entries]
+    if not sections:
+        return None
+    fig = Figure(figsize=(7, 5))
+    axes = fig.subplots(len(sections), 1, squeeze=False)
+
+    for ax, (name, entries) in zip(axes[:, 0], sections):
+        # Slowest first, from the top
+        ordered = sorted(entries.items(), key=lambda item: item[1]['total_ms'])
+        labels = [label for label, _ in ordered]
+        totals = [entry['total_ms'] for _, entry in ordered]
+        bars = ax.barh(labels, totals, color='c' if name == 'Attributes' else 'b')
+        for bar, (_, entry) in zip(bars, ordered):
+            per_call = entry['total_ms'] * 1e6 / entry['calls'] if entry['calls'] else 0
+            ax.annotate(f" {per_call:.0f} ns/call", (bar.get_width(), bar.get_y() + bar.get_height() / 2), va='center', fontsize=8)
+        ax.set_xlabel('Time (ms)')
+        ax.set_title(name, fontsize=10)
+
+    fig.suptitle(f'{title_prefix} Breakdown for {json_type} with {method}')
+    fig.tight_layout()
+    return render_png(fig)
+
+
+# The results_times of several stored runs (see run_store) overlaid in one chart
+def plot_runs(runs):
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import MaxNLocator
+
+    fig = Figure(figsize=(9, 5))
+    ax = fig.add_subplot()
+    for run in runs:
+        series = chart_series(run['time_metrics'], run['method'], run['json_type'])
+        ax.plot(series['x'], series['y'], linestyle='-', label=f"{run['id'][:8]} {run['json_type']} with {run['method']} ({run['num_records']} records)")
+
+    ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_xlabel('Entry')
+    ax.set_ylabel('Time (s)')
+    ax.set_title(f'{len(runs)} Runs')
+    ax.legend(fontsize=8)
+    return render_png(fig)
+
+
+def _cached(key, render):
+    with _chart_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            return _chart_cache[key]
+    chart = render()
+    with _chart_lock:
+        _chart_cache[key] = chart
+        while len(_chart_cache) > MAX_CACHED_CHARTS:
+            _chart_cache.popitem(last=False)
+    return chart
+
+# The charts of a run never change, so they are rendered once per run id and title. Without a run
+# id the chart is rendered every time.
+def cached_chart(run_id, kind, title_prefix, metrics, method, json_type):
+    if kind == 'breakdown':
+        render = lambda: plot_breakdown(metrics['profile'], title_prefix, method, json_type) if metrics.get('profile') else None
+    else:
+        render = lambda: plot_metrics(metrics, title_prefix, method, json_type)
+
+    if run_id is None:
+        return render()
+    return _cached((run_id, kind, title_prefix, method, json_type), render)
+
+def cached_runs_chart(runs):
+    return _cached(('runs',) + tuple(run['id'] for run in runs), lambda: plot_runs(runs))
+
+# rendering is 'png' for server-rendered images or 'json' for canvases carrying the chart series,
+# which the results page draws in the browser
+def visualize_data(time_metrics, saved_json_data, cur_method, json_type, run_id=None, rendering='png'):
+    runs = []
     visualization_html = ""
 
-    # Plot current results if available
+    # Plot current results if available, with the breakdown of a profiled run next to the timeline
     if time_metrics:
-        plot_base64 = plot_metrics(time_metrics, 'Results', cur_method, json_type)
-        plot_base64_list.append(plot_base64)
+        runs.append(('Results', time_metrics, cur_method, json_type, run_id))
 
     # Plot saved results if available
     if saved_json_data:
-        plot_base64_saved = plot_metrics(saved_json_data, 'Saved Results', saved_json_data['generation_method'], saved_json_data['json_type'])
-        plot_base64_list.append(plot_base64_saved)
+        runs.append(('Saved Results', saved_json_data, saved_json_data['generation_method'], saved_json_data['json_type'], saved_json_data.get('result_id')))
+
+    if rendering == 'json':
+        for idx, (title_prefix, metrics, method, run_json_type, _) in enumerate(runs):
+            series = chart_series(metrics, method, run_json_type)
+            series['title'] = f'{title_prefix} for {run_json_type} with {method}'
+            visualization_html += f'<canvas class="metrics-chart" data-series="{html.escape(serializer.dumps(series).decode())}" aria-label="Performance Metrics {idx+1}"></canvas>'
+        return visualization_html
+
+    plot_base64_list = []
+    for title_prefix, metrics, method, run_json_type, run_key in runs:
+        plot_base64_list.append(cached_chart(run_key, 'timeline', title_prefix, metrics, method, run_json_type))
+        plot_base64_list.append(cached_chart(run_key, 'breakdown', title_prefix, metrics, method, run_json_type))
 
     # Construct the HTML to display the plot images
-    for idx, plot_base64 in enumerate(plot_base64_list):
+    for idx, plot_base64 in enumerate(filter(None, plot_base64_list)):
         visualization_html += f'<img src="data:image/png;base64,{plot_base64}" alt="Performance Metrics {idx+1}">'
-    
+
     return visualization_html